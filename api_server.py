@@ -0,0 +1,472 @@
+"""
+HTTP JSON API for the switch catalog.
+
+Serves the CLI logic from app.py to other services without shelling out:
+
+  GET /switches?vendor=Cisco&min_ports=24&poe=yes&limit=10&fields=vendor,model
+  GET /switches/<model>          first switch whose model matches exactly (case-insensitive)
+  GET /ask?q=48 port PoE Cisco&top=3
+  GET /health
+  POST /batch                    JSON Lines of queries in, JSON Lines of answers streamed out
+
+Connections are persistent (HTTP/1.1 keep-alive), responses are gzip-compressed
+for clients that accept it, and every response carries a weak ETag derived
+from the catalog version so unchanged results revalidate with a bodiless 304.
+Encoded responses are cached; the most common listings are precomputed at
+startup.
+
+Usage:
+  python api_server.py --catalog my_switches.json --port 8080
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import io
+import itertools
+import json
+import sys
+import threading
+from collections import OrderedDict
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from app import (
+    QUERY_CACHE,
+    FilterSpec,
+    SwitchCatalog,
+    answer_question,
+    iter_filter_rows,
+    load_catalog,
+    parse_filter_query,
+    write_batch,
+    write_json_rows,
+)
+
+# Bodies smaller than this are sent uncompressed: gzip would barely shrink them.
+GZIP_MIN_BYTES = 1024
+# Common listings larger than this are not precomputed (only their row masks are).
+PRECOMPUTE_MAX_ROWS = 10_000
+
+
+
+class BadRequest(ValueError):
+    """A request the API cannot answer; reported to the client as HTTP 400."""
+
+
+class NotFound(LookupError):
+    """A request for something the API does not have; reported to the client as HTTP 404."""
+
+
+class EncodedResponse:
+    """A JSON body ready to send, with its gzip encoding computed on first use."""
+
+    def __init__(self, body: bytes, status: HTTPStatus = HTTPStatus.OK) -> None:
+        self.status = status
+        self.body = body
+        self._gzipped: Optional[bytes] = None
+        # Called once the gzip body exists, so a cache holding the response can re-measure it.
+        self.on_resize: Optional[Callable[[EncodedResponse], None]] = None
+
+    @property
+    def compressible(self) -> bool:
+        return len(self.body) >= GZIP_MIN_BYTES
+
+    def gzipped(self) -> bytes:
+        if self._gzipped is None:
+            self._gzipped = gzip.compress(self.body, compresslevel=5, mtime=0)
+            if self.on_resize is not None:
+                self.on_resize(self)
+        return self._gzipped
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + len(self._gzipped or b"")
+
+
+class ResponseCache:
+    """
+    Encoded responses keyed on ``(catalog.version, canonical request)``.
+
+    Every cached byte, gzip bodies included, counts against ``max_bytes``.
+    Pinned entries (the precomputed common queries) are never evicted but may
+    use at most half of it; pins beyond that are cached like any other entry.
+    The rest form an LRU within whatever the pins leave.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024) -> None:
+        self.max_bytes = max_bytes
+        self._pinned: Dict[Hashable, EncodedResponse] = {}
+        self._entries: "OrderedDict[Hashable, EncodedResponse]" = OrderedDict()
+        self._sizes: Dict[Hashable, int] = {}
+        self._pinned_bytes = 0
+        self._entry_bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def total_bytes(self) -> int:
+        return self._pinned_bytes + self._entry_bytes
+
+    def get(self, key: Hashable) -> Optional[EncodedResponse]:
+        with self._lock:
+            response = self._pinned.get(key)
+            if response is None:
+                response = self._entries.get(key)
+                if response is not None:
+                    self._entries.move_to_end(key)
+            return response
+
+    def put(self, key: Hashable, response: EncodedResponse, pin: bool = False) -> None:
+        if response.size > self.max_bytes // 4:
+            return  # one huge listing would flush everything else
+        with self._lock:
+            self._discard(key)
+            size = self._sizes[key] = response.size
+            if pin and self._pinned_bytes + size <= self.max_bytes // 2:
+                self._pinned[key] = response
+                self._pinned_bytes += size
+            else:
+                self._entries[key] = response
+                self._entry_bytes += size
+            response.on_resize = lambda resized: self._resize(key, resized)
+            self._evict()
+
+    def _resize(self, key: Hashable, response: EncodedResponse) -> None:
+        with self._lock:
+            pinned = self._pinned.get(key) is response
+            if not pinned and self._entries.get(key) is not response:
+                return  # evicted or replaced since
+            growth = response.size - self._sizes[key]
+            self._sizes[key] = response.size
+            if pinned:
+                self._pinned_bytes += growth
+            else:
+                self._entry_bytes += growth
+            self._evict()
+
+    def _discard(self, key: Hashable) -> None:
+        if key in self._pinned:
+            del self._pinned[key]
+            self._pinned_bytes -= self._sizes.pop(key)
+        elif key in self._entries:
+            del self._entries[key]
+            self._entry_bytes -= self._sizes.pop(key)
+
+    def _evict(self) -> None:
+        while self.total_bytes > self.max_bytes and self._entries:
+            key, _ = self._entries.popitem(last=False)
+            self._entry_bytes -= self._sizes.pop(key)
+
+
+def _json_body(payload: object) -> bytes:
+    return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+
+def _error(status: HTTPStatus, message: str) -> EncodedResponse:
+    return EncodedResponse(_json_body({"error": message}), status)
+
+
+def _single(params: Dict[str, List[str]], name: str) -> Optional[str]:
+    values = params.get(name)
+    if not values:
+        return None
+    if len(values) > 1:
+        raise BadRequest(f"'{name}' may only be given once")
+    return values[0]
+
+
+def parse_switch_query(query: str) -> Tuple[FilterSpec, Optional[int], Optional[Tuple[str, ...]]]:
+    """Turn a ``/switches`` query string into ``(spec, limit, fields)``, rejecting bad input."""
+    params = parse_qs(query, keep_blank_values=False)
+    values = {name: _single(params, name) for name in params}
+    try:
+        return parse_filter_query(values)  # type: ignore[arg-type]
+    except ValueError as exc:
+        raise BadRequest(str(exc)) from None
+
+
+class CatalogAPIServer(ThreadingHTTPServer):
+    """Threaded HTTP server answering catalog queries from one loaded catalog."""
+
+    def __init__(self, address: Tuple[str, int], catalog: SwitchCatalog, verbose: bool = False) -> None:
+        super().__init__(address, CatalogAPIHandler)
+        self.catalog = catalog
+        self.verbose = verbose
+        self.responses = ResponseCache()
+        self._models: Optional[Dict[str, int]] = None
+        self._models_lock = threading.Lock()
+
+    @property
+    def etag(self) -> str:
+        return f'W/"{self.catalog.version}"'
+
+    def model_row(self, model: str) -> Optional[int]:
+        """First row whose model equals ``model`` case-insensitively."""
+        with self._models_lock:
+            if self._models is None:
+                models: Dict[str, int] = {}
+                for row, name in enumerate(self.catalog.columns.model_lower):
+                    models.setdefault(name, row)
+                self._models = models
+        return self._models.get(model.lower())
+
+    def switches(self, spec: FilterSpec, limit: Optional[int], fields: Optional[Tuple[str, ...]]) -> EncodedResponse:
+        # Full listings may shard their row checks across processes; limited ones stop early.
+        rows = iter_filter_rows(self.catalog, spec, workers=None if limit is None else 1)
+        if limit is not None:
+            rows = itertools.islice(rows, limit)
+        buffer = io.StringIO()
+        write_json_rows(self.catalog, rows, buffer, pretty=False, fields=fields)
+        return EncodedResponse(buffer.getvalue().encode("utf-8"))
+
+    def respond(self, path: str, query: str, revalidate: bool = False) -> EncodedResponse:
+        """
+        The response for a GET of ``path?query``, from the cache when possible.
+
+        ``revalidate`` means the client already holds the current ETag: a
+        request that would succeed then gets a bodiless 304 without its body
+        being computed, while bad requests still get their 400/404.
+        """
+        try:
+            key, compute = self._route(path, query)
+        except BadRequest as exc:
+            return _error(HTTPStatus.BAD_REQUEST, str(exc))
+        except NotFound as exc:
+            return _error(HTTPStatus.NOT_FOUND, str(exc))
+        if revalidate:
+            return EncodedResponse(b"", HTTPStatus.NOT_MODIFIED)
+        if key is None:
+            return compute()
+
+        key = (self.catalog.version, key)
+        response = self.responses.get(key)
+        if response is None:
+            response = compute()
+            self.responses.put(key, response)
+        return response
+
+    def _route(self, path: str, query: str) -> Tuple[Optional[Hashable], Callable[[], EncodedResponse]]:
+        """
+        Validate a request and return its cache key (``None``: not cached) and body builder.
+
+        Raises ``BadRequest`` or ``NotFound`` for requests that cannot succeed.
+        """
+        if path == "/health":
+            return None, lambda: EncodedResponse(
+                _json_body({"status": "ok", "version": self.catalog.version, "switches": len(self.catalog)})
+            )
+        if path == "/switches":
+            spec, limit, fields = parse_switch_query(query)
+            return ("switches", spec, limit, fields), lambda: self.switches(spec, limit, fields)
+        if path.startswith("/switches/"):
+            model = unquote(path[len("/switches/") :])
+            row = self.model_row(model)
+            if row is None:
+                raise NotFound(f"no switch with model {model!r}")
+            return ("model", model.lower()), lambda: EncodedResponse(self.catalog.json_fragment(row).encode("utf-8"))
+        if path == "/ask":
+            params = parse_qs(query)
+            question = _single(params, "q")
+            if not question:
+                raise BadRequest("'q' is required")
+            top_text = _single(params, "top")
+            try:
+                top = 3 if top_text is None else max(1, int(top_text))
+            except ValueError:
+                raise BadRequest("'top' must be an integer") from None
+            return ("ask", question, top), lambda: EncodedResponse(
+                _json_body({"question": question, "answer": answer_question(question, self.catalog, top=top)})
+            )
+        raise NotFound(f"no such endpoint: {path}")
+
+    def precompute_common(self) -> int:
+        """
+        Cache the listings most clients start from; returns how many were stored.
+
+        Every common filter's row mask is warmed in the query cache, but only
+        listings of at most ``PRECOMPUTE_MAX_ROWS`` switches are encoded ahead.
+        They are pinned while the cache's pin budget lasts.
+        """
+        columns = self.catalog.columns
+        specs = [FilterSpec()]
+        specs += [FilterSpec(vendor=vendor) for vendor in columns.vendor.folded_counts()]
+        specs += [FilterSpec(layer=layer) for layer in columns.layer.folded_counts()]
+        specs += [FilterSpec(poe=True), FilterSpec(managed=True), FilterSpec(stackable=True)]
+        stored = 0
+        for spec in specs:
+            if QUERY_CACHE.select(self.catalog, spec).bit_count() > PRECOMPUTE_MAX_ROWS:
+                continue
+            response = self.switches(spec, None, None)
+            if response.compressible:
+                response.gzipped()
+            self.responses.put((self.catalog.version, ("switches", spec, None, None)), response, pin=True)
+            stored += 1
+        return stored
+
+
+class CatalogAPIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # persistent connections by default
+    server_version = "SwitchCatalogAPI/1.0"
+    timeout = 30  # seconds an idle keep-alive connection is held open
+    server: CatalogAPIServer
+
+    def do_GET(self) -> None:
+        self._answer(send_body=True)
+
+    def do_HEAD(self) -> None:
+        self._answer(send_body=False)
+
+    def do_POST(self) -> None:
+        url = urlsplit(self.path)
+        if url.path.rstrip("/") != "/batch":
+            self._send_error(_error(HTTPStatus.NOT_FOUND, f"no such endpoint: {url.path}"))
+            return
+        length = self.headers.get("Content-Length")
+        if length is None or not length.isdigit():
+            self._send_error(_error(HTTPStatus.LENGTH_REQUIRED, "a Content-Length header is required"))
+            return
+        try:
+            concurrency = _single(parse_qs(url.query), "concurrency")
+            workers = None if concurrency is None else max(1, int(concurrency))
+            lines = self.rfile.read(int(length)).decode("utf-8").splitlines()
+        except (BadRequest, ValueError) as exc:
+            self._send_error(_error(HTTPStatus.BAD_REQUEST, f"bad batch request: {exc}"))
+            return
+
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        with _ChunkedWriter(self.wfile) as out:
+            write_batch(self.server.catalog, lines, out, workers)
+
+    def _send_error(self, response: EncodedResponse) -> None:
+        self.send_response(response.status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(response.body)))
+        self.end_headers()
+        self.wfile.write(response.body)
+
+    def _answer(self, send_body: bool) -> None:
+        url = urlsplit(self.path)
+        etag = self.server.etag
+        response = self.server.respond(
+            url.path.rstrip("/") or "/", url.query, revalidate=_etag_matches(self.headers.get("If-None-Match"), etag)
+        )
+        if response.status == HTTPStatus.NOT_MODIFIED:
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.send_header("Vary", "Accept-Encoding")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        body = response.body
+        gzipped = response.compressible and _accepts_gzip(self.headers.get("Accept-Encoding", ""))
+        if gzipped:
+            body = response.gzipped()
+
+        self.send_response(response.status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Vary", "Accept-Encoding")
+        if gzipped:
+            self.send_header("Content-Encoding", "gzip")
+        if response.status == HTTPStatus.OK:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:  # noqa: A002 - BaseHTTPRequestHandler signature
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class _ChunkedWriter(io.TextIOBase):
+    """Text stream sent as HTTP/1.1 chunks of about 64 KiB; closing sends the last chunk."""
+
+    def __init__(self, wfile, chunk_size: int = 64 * 1024) -> None:
+        self._wfile = wfile
+        self._chunk_size = chunk_size
+        self._pending: List[bytes] = []
+        self._pending_size = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        data = text.encode("utf-8")
+        self._pending.append(data)
+        self._pending_size += len(data)
+        if self._pending_size >= self._chunk_size:
+            self.flush()
+        return len(text)
+
+    def flush(self) -> None:
+        if self._pending_size:
+            payload = b"".join(self._pending)
+            self._pending.clear()
+            self._pending_size = 0
+            self._wfile.write(b"%x\r\n%s\r\n" % (len(payload), payload))
+
+    def close(self) -> None:
+        if not self.closed:
+            self.flush()
+            self._wfile.write(b"0\r\n\r\n")
+        super().close()
+
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    """Weak comparison (RFC 9110) of an If-None-Match header against ``etag``."""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in header.split(","))
+
+
+def _accepts_gzip(header: str) -> bool:
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        if coding.strip().lower() in ("gzip", "x-gzip", "*"):
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Serve the switch catalog as an HTTP JSON API.")
+    parser.add_argument("--catalog", help="Path to a JSON or JSON Lines catalog (default: built-in sample).")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to bind (default: %(default)s).")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on (default: %(default)s).")
+    parser.add_argument(
+        "--no-precompute",
+        action="store_true",
+        help="Skip precomputing the common listings (all, per vendor/layer, PoE/managed/stackable) at startup.",
+    )
+    parser.add_argument("--verbose", action="store_true", help="Log every request to stderr.")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    catalog = load_catalog(args.catalog)
+    server = CatalogAPIServer((args.host, args.port), catalog, verbose=args.verbose)
+    if not args.no_precompute:
+        server.precompute_common()
+    host, port = server.server_address[:2]
+    print(f"Serving {len(catalog)} switches on http://{host}:{port}/", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
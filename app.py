@@ -4,7 +4,7 @@ Switch catalog CLI with configuration snippets.
 - Built-in catalog of common switch models across several vendors
 - Search and filter by vendor/model/ports/PoE/L2-L3/managed/stackable
 - Optional CLI configuration snippets and troubleshooting commands per device family
-- Optional JSON catalog input (your own inventory of switch models)
+- Optional JSON or JSON Lines catalog input (your own inventory of switch models)
 
 Usage examples:
   python app.py
@@ -12,21 +12,62 @@ Usage examples:
   python app.py --keyword "campus" --include-cli
   python app.py --ask "48 port PoE Cisco stackable L3"
   python app.py --output json --poe yes
+  python app.py --output csv --fields vendor,model,ports,poe_budget
+  python app.py --poe yes --layer L3 --facets vendor,stackable,ports-bucket
   python app.py --catalog my_switches.json --group-by-vendor --include-cli
+  python app.py --catalog my_switches.json --batch queries.jsonl
+  python app.py serve --catalog my_switches.json &
+  python app.py --server --catalog my_switches.json --vendor Cisco --output ndjson
 """
 
 from __future__ import annotations
 
 import argparse
+import asyncio
+import atexit
+import contextlib
+import csv
+import hashlib
+import heapq
+import io
+import itertools
 import json
+import mmap
+import multiprocessing
+import os
+import pickle
+import re
+import shutil
+import signal
+import socket
+import socketserver
+import struct
 import sys
-from dataclasses import asdict, dataclass
+import tempfile
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter, OrderedDict, deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, fields, replace
+from functools import cached_property
+from json.encoder import encode_basestring_ascii  # type: ignore[attr-defined]
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Tuple
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Switch:
+    """
+    One catalog entry.
+
+    Records are slotted and immutable. Vendor, layer and uplink strings are
+    interned, and CLI sections / troubleshooting lists are converted to tuples.
+    Records built through one ``BlockPool`` (as every catalog build does) share
+    identical blocks by reference. Treat ``cli_sections`` as read-only.
+    """
+
     vendor: str
     model: str
     ports: int
@@ -37,15 +78,23 @@ class Switch:
     uplink: str
     uplink_count: int
     poe_budget: Optional[int]
-    cli_sections: Dict[str, List[str]]
-    troubleshooting: List[str]
+    cli_sections: Dict[str, Tuple[str, ...]]
+    troubleshooting: Tuple[str, ...]
     notes: str
 
-    def matches_keyword(self, keyword: Optional[str]) -> bool:
-        if not keyword:
-            return True
-        keyword = keyword.lower()
-        haystack = " ".join(
+    def __post_init__(self) -> None:
+        for name in ("vendor", "layer", "uplink"):
+            object.__setattr__(self, name, _intern(getattr(self, name)))
+        object.__setattr__(self, "cli_sections", _section_tuples(self.cli_sections))
+        object.__setattr__(self, "troubleshooting", _line_tuple(self.troubleshooting))
+
+    def to_dict(self) -> Dict[str, object]:
+        """Shallow field mapping for serialization (shares the record's blocks; do not mutate)."""
+        return {name: getattr(self, name) for name in _SWITCH_FIELDS}
+
+    def search_text(self) -> str:
+        """Lowercased text that keyword searches are matched against."""
+        return " ".join(
             [
                 self.vendor,
                 self.model,
@@ -56,7 +105,175 @@ class Switch:
                 " ".join(" ".join(cmds) for cmds in self.cli_sections.values()),
             ]
         ).lower()
-        return keyword in haystack
+
+    def matches_keyword(self, keyword: Optional[str]) -> bool:
+        if not keyword:
+            return True
+        return keyword.lower() in self.search_text()
+
+
+_SWITCH_FIELDS = tuple(field.name for field in fields(Switch))
+_SWITCH_JSON_KEYS = tuple((name, json.dumps(name)) for name in _SWITCH_FIELDS)
+
+
+def switch_json(
+    sw: Switch, pretty: bool = False, blocks: Optional[Dict[int, Tuple[object, str]]] = None
+) -> str:
+    """
+    Serialize one switch.
+
+    The compact form is a single line. The pretty form matches the record's
+    text inside ``json.dump([...], indent=2)``, i.e. already indented as an
+    array element.
+
+    Bulk callers pass a ``blocks`` memo (one per form, for one pass or one
+    catalog) so the CLI/troubleshooting blocks shared across records are
+    encoded once per block rather than once per record. Fields are encoded
+    one by one because ``json.dumps`` with ``indent`` runs the pure-Python
+    encoder.
+    """
+    separator = ": " if pretty else ":"
+    parts = []
+    for name, key in _SWITCH_JSON_KEYS:
+        value = getattr(sw, name)
+        if name in ("cli_sections", "troubleshooting"):
+            text = _block_json(value, pretty, blocks)
+        else:
+            encode = _JSON_SCALARS.get(type(value))
+            text = encode(value) if encode is not None else json.dumps(value)
+        parts.append(key + separator + text)
+    if pretty:
+        return "{\n    " + ",\n    ".join(parts) + "\n  }"
+    return "{" + ",".join(parts) + "}"
+
+
+# Exact encoders for the scalar field types (floats go through json.dumps for NaN/Infinity).
+_JSON_SCALARS: Dict[type, Callable[[object], str]] = {
+    str: encode_basestring_ascii,
+    int: int.__repr__,
+    bool: lambda value: "true" if value else "false",
+    type(None): lambda value: "null",
+}
+
+
+def _block_json(block: object, pretty: bool, blocks: Optional[Dict[int, Tuple[object, str]]]) -> str:
+    if blocks is not None:
+        entry = blocks.get(id(block))
+        if entry is not None and entry[0] is block:
+            return entry[1]
+    if pretty:
+        text = json.dumps(block, indent=2).replace("\n", "\n    ")
+    else:
+        text = json.dumps(block, separators=(",", ":"))
+    if blocks is not None:
+        blocks[id(block)] = (block, text)  # the entry keeps the block alive, so its id stays unique
+    return text
+
+
+def _json_object(values: Dict[str, object], pretty: bool) -> str:
+    if pretty:
+        return json.dumps(values, indent=2).replace("\n", "\n  ")
+    return json.dumps(values, separators=(",", ":"))
+
+
+# ---------- Shared, deduplicated record blocks ----------
+
+
+def _intern(value: object) -> object:
+    return sys.intern(value) if type(value) is str else value
+
+
+def _line_tuple(lines: Iterable[str]) -> Tuple[str, ...]:
+    if type(lines) is tuple:
+        return lines  # type: ignore[return-value]
+    return tuple(_intern(line) for line in lines)  # type: ignore[misc]
+
+
+def _section_tuples(sections: Dict[str, Iterable[str]]) -> Dict[str, Tuple[str, ...]]:
+    if all(type(cmds) is tuple for cmds in sections.values()):
+        return sections  # type: ignore[return-value]  # already converted (e.g. pooled)
+    return {_intern(name): _line_tuple(cmds) for name, cmds in sections.items()}  # type: ignore[misc]
+
+
+class BlockPool:
+    """
+    Deduplicates CLI/troubleshooting blocks across the records of one catalog build.
+
+    Every record built through the same pool points at a single copy of each
+    distinct block, and pooled blocks are never mutated. A pool is scoped to
+    one build, so a dropped catalog takes its blocks with it.
+    """
+
+    def __init__(self) -> None:
+        self._lines: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+        self._sections: Dict[Tuple[Tuple[str, Tuple[str, ...]], ...], Dict[str, Tuple[str, ...]]] = {}
+
+    def lines(self, lines: Iterable[str]) -> Tuple[str, ...]:
+        """Pooled tuple equal to ``lines``."""
+        block = tuple(_intern(line) for line in lines)
+        return self._lines.setdefault(block, block)  # type: ignore[arg-type]
+
+    def sections(self, sections: Dict[str, Iterable[str]]) -> Dict[str, Tuple[str, ...]]:
+        """Pooled ``{section: commands}`` mapping equal to ``sections``, with tuple values."""
+        key = tuple((_intern(name), self.lines(cmds)) for name, cmds in sections.items())
+        shared = self._sections.get(key)  # type: ignore[arg-type]
+        if shared is None:
+            shared = self._sections.setdefault(key, dict(key))  # type: ignore[arg-type]
+        return shared
+
+    def share(self, sw: Switch) -> Switch:
+        """``sw`` with its blocks replaced by the pooled copies."""
+        return replace(
+            sw, cli_sections=self.sections(sw.cli_sections), troubleshooting=self.lines(sw.troubleshooting)
+        )
+
+
+def catalog_footprint(catalog: Iterable[Switch]) -> Dict[str, int]:
+    """
+    Measure the memory held by catalog records, counting shared objects once.
+
+    Returns byte totals for the record shells, the strings they reference and
+    the CLI/troubleshooting blocks, plus counts used for per-record sizing.
+    """
+    seen: set = set()
+    totals = {"records": 0, "record_bytes": 0, "string_bytes": 0, "block_bytes": 0, "distinct_blocks": 0}
+
+    def account(obj: object, bucket: str) -> None:
+        if id(obj) not in seen:
+            seen.add(id(obj))
+            totals[bucket] += sys.getsizeof(obj)
+
+    for sw in catalog:
+        totals["records"] += 1
+        totals["record_bytes"] += sys.getsizeof(sw)
+        for name in ("vendor", "model", "layer", "uplink", "notes"):
+            account(getattr(sw, name), "string_bytes")
+        for block in (sw.troubleshooting, sw.cli_sections):
+            if id(block) not in seen:
+                totals["distinct_blocks"] += 1
+            account(block, "block_bytes")
+        for line in sw.troubleshooting:
+            account(line, "string_bytes")
+        for name, cmds in sw.cli_sections.items():
+            account(name, "string_bytes")
+            account(cmds, "block_bytes")
+            for cmd in cmds:
+                account(cmd, "string_bytes")
+    totals["total_bytes"] = totals["record_bytes"] + totals["string_bytes"] + totals["block_bytes"]
+    return totals
+
+
+def format_footprint(footprint: Dict[str, int]) -> str:
+    records = footprint["records"] or 1
+    return "\n".join(
+        [
+            f"Records: {footprint['records']}",
+            f"Record objects: {footprint['record_bytes']} bytes ({footprint['record_bytes'] // records} per record)",
+            f"Unique strings: {footprint['string_bytes']} bytes",
+            f"Distinct CLI/troubleshooting blocks: {footprint['distinct_blocks']} ({footprint['block_bytes']} bytes)",
+            f"Total: {footprint['total_bytes']} bytes (~{footprint['total_bytes'] // records} per record)",
+        ]
+    )
 
 
 # ---------- Built-in command templates (kept simple + safe) ----------
@@ -165,7 +382,8 @@ UNMANAGED_CLI = {
 
 def default_catalog() -> List[Switch]:
     """Built-in catalog so the app works out of the box."""
-    return [
+    pool = BlockPool()
+    switches = [
         # ---------------- Cisco ----------------
         Switch(
             vendor="Cisco",
@@ -510,316 +728,2801 @@ def default_catalog() -> List[Switch]:
             notes="ProCurve/ArubaOS-Switch family with stacking support.",
         ),
     ]
+    return [pool.share(sw) for sw in switches]
 
 
-def load_catalog(path: Optional[str]) -> List[Switch]:
-    if not path:
-        return default_catalog()
-
-    data = json.loads(Path(path).read_text())
-    catalog = []
-    for item in data:
-        catalog.append(
-            Switch(
-                vendor=item["vendor"],
-                model=item["model"],
-                ports=int(item["ports"]),
-                poe=bool(item["poe"]),
-                layer=item["layer"],
-                managed=bool(item["managed"]),
-                stackable=bool(item["stackable"]),
-                uplink=item.get("uplink", "N/A"),
-                uplink_count=int(item.get("uplink_count", 0)),
-                poe_budget=item.get("poe_budget"),
-                cli_sections=item.get("cli_sections", {}),
-                troubleshooting=item.get("troubleshooting", []),
-                notes=item.get("notes", ""),
-            )
-        )
-    return catalog
+# ---------- Columnar catalog (built once, filtered with whole-column masks) ----------
 
+# Row sets are plain Python ints used as bitsets: bit i set means row i is selected.
+# Big-int &, | and ^ run in C over the whole column, so a predicate costs one
+# machine pass per 64 rows instead of one interpreter iteration per row.
 
-def filter_catalog(catalog: Iterable[Switch], args: argparse.Namespace) -> List[Switch]:
-    def bool_filter(value: bool, selector: Optional[str]) -> bool:
-        if selector is None:
-            return True
-        if selector.lower() == "yes":
-            return value
-        if selector.lower() == "no":
-            return not value
-        return True
+# Positions of the set bits in every byte value, used to walk a mask quickly.
+_BYTE_BITS = tuple(tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256))
 
-    results = []
-    for item in catalog:
-        if args.vendor and item.vendor.lower() != args.vendor.lower():
-            continue
-        if args.model and args.model.lower() not in item.model.lower():
-            continue
-        if not item.matches_keyword(args.keyword):
-            continue
-        if args.min_ports and item.ports < args.min_ports:
-            continue
-        if args.max_ports and item.ports > args.max_ports:
-            continue
-        if args.layer and item.layer.lower() != args.layer.lower():
-            continue
-        if not bool_filter(item.poe, args.poe):
-            continue
-        if not bool_filter(item.managed, args.managed):
-            continue
-        if not bool_filter(item.stackable, args.stackable):
-            continue
-        results.append(item)
-    return results
 
+def _mask_from_rows(rows: Iterable[int], size: int) -> int:
+    """Build a row mask from row indexes."""
+    buf = bytearray((size + 7) // 8)
+    for row in rows:
+        buf[row >> 3] |= 1 << (row & 7)
+    return int.from_bytes(buf, "little")
 
-def format_table(items: List[Switch], include_cli: bool, group_by_vendor: bool) -> str:
-    if not items:
-        return "No switches matched your criteria."
-
-    headers = [
-        "Vendor",
-        "Model",
-        "Ports",
-        "PoE",
-        "Layer",
-        "Managed",
-        "Stackable",
-        "Uplinks",
-        "PoE Budget (W)",
-        "Notes",
-    ]
 
-    def render_rows(rows: List[List[str]]) -> List[str]:
-        col_widths = [max(len(row[i]) for row in rows + [headers]) for i in range(len(headers))]
+def _mask_where(values: Iterable[object], predicate: Callable[[object], bool]) -> int:
+    """Build a row mask selecting the values for which ``predicate`` holds."""
+    bits = "".join(["1" if predicate(value) else "0" for value in values])
+    return int(bits[::-1], 2) if bits else 0
 
-        def render_row(row: List[str]) -> str:
-            return " | ".join(cell.ljust(col_widths[i]) for i, cell in enumerate(row))
 
-        lines = [render_row(headers), "-+-".join("-" * w for w in col_widths)]
-        lines.extend(render_row(row) for row in rows)
-        return lines
+def _iter_mask(mask: int, size: int) -> Iterator[int]:
+    """Yield the row indexes selected by ``mask`` in ascending order."""
+    for offset, byte in enumerate(mask.to_bytes((size + 7) // 8, "little")):
+        if byte:
+            base = offset << 3
+            for bit in _BYTE_BITS[byte]:
+                yield base + bit
 
-    def render_cli(sw: Switch) -> List[str]:
-        if not include_cli:
-            return []
-        lines: List[str] = [f"[{sw.vendor} {sw.model}]"]
-        for section, commands in sw.cli_sections.items():
-            lines.append(f"  {section}:")
-            for cmd in commands:
-                lines.append(f"    {cmd}")
-        if sw.troubleshooting:
-            lines.append("  Troubleshooting:")
-            for cmd in sw.troubleshooting:
-                lines.append(f"    {cmd}")
-        lines.append("")
-        return lines
 
-    lines: List[str] = []
-    if group_by_vendor:
-        vendors = sorted({sw.vendor for sw in items})
-        for vendor in vendors:
-            subset = [sw for sw in items if sw.vendor == vendor]
-            lines.append(f"== {vendor} ==")
-            rows = [
-                [
-                    sw.vendor,
-                    sw.model,
-                    str(sw.ports),
-                    "Yes" if sw.poe else "No",
-                    sw.layer,
-                    "Yes" if sw.managed else "No",
-                    "Yes" if sw.stackable else "No",
-                    f"{sw.uplink_count} @ {sw.uplink}",
-                    str(sw.poe_budget) if sw.poe_budget is not None else "-",
-                    sw.notes,
-                ]
-                for sw in subset
-            ]
-            lines.extend(render_rows(rows))
-            if include_cli:
-                lines.append("Configuration snippets:")
-                for sw in subset:
-                    lines.extend(render_cli(sw))
-    else:
-        rows = [
-            [
-                sw.vendor,
-                sw.model,
-                str(sw.ports),
-                "Yes" if sw.poe else "No",
-                sw.layer,
-                "Yes" if sw.managed else "No",
-                "Yes" if sw.stackable else "No",
-                f"{sw.uplink_count} @ {sw.uplink}",
-                str(sw.poe_budget) if sw.poe_budget is not None else "-",
-                sw.notes,
-            ]
-            for sw in items
-        ]
-        lines.extend(render_rows(rows))
-        if include_cli:
-            lines.append("Configuration snippets:")
-            for sw in items:
-                lines.extend(render_cli(sw))
+def _row_tester(mask: int, size: int) -> Callable[[int], int]:
+    """Constant-time membership test for ``mask`` (shifting a huge int is not)."""
+    bits = mask.to_bytes((size + 7) // 8, "little")
+    return lambda row: bits[row >> 3] >> (row & 7) & 1
 
-    return "\n".join(lines).rstrip()
 
+def iter_rows_from(mask: int, size: int, start: int) -> Iterator[int]:
+    """Rows of ``mask`` at or after row ``start``, in order (a cursor for paging)."""
+    for row in _iter_mask(mask >> start, size - start):
+        yield start + row
+
+
+def _optional_int(value: object) -> Optional[int]:
+    if value is None:
+        return None
+    try:
+        return int(value)  # type: ignore[arg-type]
+    except (TypeError, ValueError):
+        return None
+
+
+class DictionaryColumn:
+    """Dictionary-encoded string column with one row mask per distinct value."""
+
+    def __init__(self, values: Iterable[str]) -> None:
+        self.values: List[str] = []
+        self.codes = array("l")
+        lookup: Dict[str, int] = {}
+        rows_by_code: List[List[int]] = []
+        for row, value in enumerate(values):
+            code = lookup.get(value)
+            if code is None:
+                code = lookup[value] = len(self.values)
+                self.values.append(value)
+                rows_by_code.append([])
+            self.codes.append(code)
+            rows_by_code[code].append(row)
+
+        size = len(self.codes)
+        self.masks = [_mask_from_rows(rows, size) for rows in rows_by_code]
+        self._folded: Dict[str, int] = {}
+        for code, value in enumerate(self.values):
+            key = value.lower()
+            self._folded[key] = self._folded.get(key, 0) | self.masks[code]
+
+    def mask_for(self, value: str) -> int:
+        """Rows whose value equals ``value`` case-insensitively."""
+        return self._folded.get(value.lower(), 0)
 
-def answer_question(question: str, catalog: List[Switch]) -> str:
+    def folded_counts(self) -> Dict[str, int]:
+        """Row count per lowercased value."""
+        return {value: mask.bit_count() for value, mask in self._folded.items()}
+
+    def facet(self, within: int) -> Dict[str, int]:
+        """Rows of ``within`` per case-folded value, labelled with the value's first spelling."""
+        labels: Dict[str, str] = {}
+        for value in self.values:
+            labels.setdefault(value.lower(), value)
+        counts = {labels[key]: (within & mask).bit_count() for key, mask in self._folded.items()}
+        return {label: count for label, count in counts.items() if count}
+
+
+# Cumulative masks kept per ``RangeIndex`` (each one is a row bitmap).
+RANGE_PREFIX_MASKS = 64
+
+
+class RangeIndex:
     """
-    Lightweight, rule-based assistant to suggest switches and commands.
+    Rows sorted by a numeric column, so a range predicate is one contiguous slice.
 
-    This is intentionally simple (no external AI/LLM calls). It scores switches by
-    matching vendor/model keywords and then crafts a short recommendation plus
-    next steps.
+    Cumulative row masks are kept at up to ``RANGE_PREFIX_MASKS`` points of
+    the sorted order, at every distinct key when there are few enough of
+    them. A range is then two prefix masks XORed, plus the rows between a
+    bound and its checkpoint when keys are too many to mark each one.
     """
 
-    def score_switch(sw: Switch, q: str) -> int:
-        score = 0
-        q_low = q.lower()
-        if sw.vendor.lower() in q_low:
-            score += 3
-        if sw.model.lower() in q_low:
-            score += 3
-        if "poe" in q_low and sw.poe:
-            score += 2
-        if "stack" in q_low and sw.stackable:
-            score += 2
-        if "layer 3" in q_low or "l3" in q_low:
-            score += 1 if sw.layer.lower() == "l3" else 0
-        if "troubleshoot" in q_low or "diagnose" in q_low:
-            score += 1 if sw.troubleshooting else 0
-        if "uplink" in q_low:
-            score += 1
-        return score
+    def __init__(self, values: Sequence[int], rows: Optional[Iterable[int]] = None) -> None:
+        self.size = len(values)
+        order = sorted(range(self.size) if rows is None else rows, key=values.__getitem__)
+        self.keys = array("q", (values[row] for row in order))
+        self.rows = array("I", order)
 
-    ranked: List[Tuple[int, Switch]] = []
-    for sw in catalog:
-        ranked.append((score_switch(sw, question), sw))
-    ranked.sort(key=lambda x: x[0], reverse=True)
+        boundaries = [0] + [pos for pos in range(1, len(self.keys)) if self.keys[pos] != self.keys[pos - 1]]
+        if len(boundaries) > RANGE_PREFIX_MASKS:
+            step = -(-len(self.keys) // RANGE_PREFIX_MASKS)
+            boundaries = list(range(0, len(self.keys), step))
+        self.checkpoints = array("q", boundaries + [len(self.keys)])
+        self.prefix_masks = [0]
+        for start, end in zip(self.checkpoints, self.checkpoints[1:]):
+            self.prefix_masks.append(self.prefix_masks[-1] | _mask_from_rows(self.rows[start:end], self.size))
+        self.indexed = self.prefix_masks[-1]
 
-    best_score, best = ranked[0]
-    if best_score == 0:
-        return (
-            "I didn't find a specific match. Try mentioning a vendor or feature "
-            "(e.g., 'Cisco PoE 48-port stackable L3 with troubleshooting commands')."
+    def span(self, low: Optional[int], high: Optional[int]) -> Tuple[int, int]:
+        start = 0 if low is None else bisect_left(self.keys, low)
+        end = len(self.keys) if high is None else bisect_right(self.keys, high)
+        return start, max(start, end)
+
+    def count(self, low: Optional[int], high: Optional[int]) -> int:
+        start, end = self.span(low, high)
+        return end - start
+
+    def _prefix(self, position: int) -> int:
+        """Rows of the first ``position`` entries of the sorted order."""
+        checkpoint = bisect_right(self.checkpoints, position) - 1
+        mask = self.prefix_masks[checkpoint]
+        start = self.checkpoints[checkpoint]
+        if position > start:
+            mask |= _mask_from_rows(self.rows[start:position], self.size)
+        return mask
+
+    def mask(self, low: Optional[int], high: Optional[int]) -> int:
+        """Rows with ``low <= value <= high`` (either bound may be ``None``)."""
+        start, end = self.span(low, high)
+        return self._prefix(end) ^ self._prefix(start)
+
+
+class ColumnStats:
+    """Value distributions gathered at load time for the query planner.
+
+    Numeric columns need no histogram: their ``RangeIndex`` counts any range exactly.
+    """
+
+    def __init__(self, columns: "CatalogColumns") -> None:
+        self.rows = columns.size
+        self.vendor_counts = columns.vendor.folded_counts()
+        self.layer_counts = columns.layer.folded_counts()
+        self.true_counts = {
+            "poe": columns.poe.bit_count(),
+            "managed": columns.managed.bit_count(),
+            "stackable": columns.stackable.bit_count(),
+        }
+
+
+class CatalogColumns:
+    """Column-oriented copy of a catalog used to evaluate filters without touching rows."""
+
+    def __init__(self, records: Sequence[Switch]) -> None:
+        self.size = len(records)
+        self.all_rows = (1 << self.size) - 1
+
+        self.ports = array("q", (sw.ports for sw in records))
+        self.uplink_count = array("q", (sw.uplink_count for sw in records))
+        budgets = [_optional_int(sw.poe_budget) for sw in records]
+        self.poe_budget = array("q", (budget or 0 for budget in budgets))
+        self.has_poe_budget = _mask_where(budgets, lambda budget: budget is not None)
+        # Rows whose record holds exactly the column value; the others (60.5, "120") keep theirs.
+        self.poe_budget_verbatim = _mask_where(records, lambda sw: sw.poe_budget is None or type(sw.poe_budget) is int)
+
+        self.poe = _mask_where(records, lambda sw: sw.poe)
+        self.managed = _mask_where(records, lambda sw: sw.managed)
+        self.stackable = _mask_where(records, lambda sw: sw.stackable)
+
+        self.vendor = DictionaryColumn(sw.vendor for sw in records)
+        self.layer = DictionaryColumn(sw.layer for sw in records)
+        self.model = [sw.model for sw in records]
+        self.model_lower = [model.lower() for model in self.model]
+
+        self.ports_index = RangeIndex(self.ports)
+        self.uplink_index = RangeIndex(self.uplink_count)
+        self.poe_budget_index = RangeIndex(
+            self.poe_budget, (row for row, budget in enumerate(budgets) if budget is not None)
         )
+        self.stats = ColumnStats(self)
 
-    lines = [
-        (
-            f"Suggested match: {best.vendor} {best.model} ({best.layer}, {best.ports} ports, "
-            f"{'PoE' if best.poe else 'non-PoE'}, "
-            f"{'stackable' if best.stackable else 'non-stackable'})."
-        ),
-        (
-            f"Uplinks: {best.uplink_count} @ {best.uplink}. PoE budget: "
-            f"{best.poe_budget if best.poe_budget is not None else 'N/A'}."
-        ),
-        f"Notes: {best.notes}",
-    ]
+    def bool_mask(self, column: int, wanted: Optional[bool]) -> int:
+        """Rows whose boolean ``column`` equals ``wanted`` (all rows when ``None``)."""
+        if wanted is None:
+            return self.all_rows
+        return column if wanted else self.all_rows ^ column
 
-    if best.cli_sections:
-        lines.append("Key configuration sections:")
-        for section, cmds in best.cli_sections.items():
-            preview = "; ".join(cmds[:4])
-            if len(cmds) > 4:
-                preview += " ..."
-            lines.append(f"  - {section}: {preview}")
+    def refine(self, mask: int, predicate: Callable[[int], bool]) -> int:
+        """Keep the rows of ``mask`` for which ``predicate(row)`` holds."""
+        return _mask_from_rows((row for row in _iter_mask(mask, self.size) if predicate(row)), self.size)
 
-    if best.troubleshooting:
-        preview = "; ".join(best.troubleshooting[:4])
-        if len(best.troubleshooting) > 4:
-            preview += " ..."
-        lines.append(f"Troubleshooting tips: {preview}")
 
-    lines.append("You can see full details with:")
-    lines.append(
-        f'  python app.py --vendor "{best.vendor}" --model "{best.model}" --include-cli --group-by-vendor'
-    )
+_WORD_RE = re.compile(r"\w+")
 
-    return "\n".join(lines)
 
+class KeywordIndex:
+    """Inverted index (token -> posting list of rows) over ``Switch.search_text``.
 
-def parse_args() -> argparse.Namespace:
-    parser = argparse.ArgumentParser(
-        description="Search and explore switch models with example CLI configurations."
-    )
-    parser.add_argument(
-        "--catalog",
-        help="Path to a JSON catalog (list of switches) to use instead of the built-in sample.",
-    )
-    parser.add_argument("--vendor", help="Exact vendor match (e.g., Cisco, Juniper).")
-    parser.add_argument("--model", help="Substring match on the model name.")
-    parser.add_argument(
-        "--keyword",
-        help="Keyword to search across vendor, model, uplink, and notes (case-insensitive).",
-    )
-    parser.add_argument("--layer", choices=["L2", "L3"], help="Layer capability filter.")
-    parser.add_argument("--min-ports", type=int, help="Minimum copper port count.")
-    parser.add_argument("--max-ports", type=int, help="Maximum copper port count.")
-    parser.add_argument(
-        "--poe",
-        choices=["yes", "no"],
-        help="Filter by Power-over-Ethernet support.",
-    )
-    parser.add_argument(
-        "--managed",
-        choices=["yes", "no"],
-        help="Filter by managed vs unmanaged.",
-    )
-    parser.add_argument(
-        "--stackable",
-        choices=["yes", "no"],
-        help="Filter by stackable capability.",
-    )
-    parser.add_argument(
-        "--output",
-        choices=["table", "json"],
-        default="table",
-        help="Choose output format.",
-    )
-    parser.add_argument(
-        "--include-cli",
-        action="store_true",
-        help="Include sample CLI configuration snippets in the output.",
-    )
-    parser.add_argument(
-        "--group-by-vendor",
-        action="store_true",
-        help="Group results by vendor with per-vendor tables and command sections.",
-    )
-    parser.add_argument(
-        "--ask",
-        help="Ask a natural-language question (e.g., 'PoE 48-port Cisco with troubleshooting commands').",
-    )
-    parser.add_argument(
-        "--limit",
-        type=int,
-        help="Limit the number of results shown (after filtering).",
-    )
-    return parser.parse_args()
+    Tokens are maximal runs of word characters, so a keyword made of a single
+    word can only occur inside one token: its rows are exactly the union of the
+    postings of every token containing it. Keywords spanning punctuation or
+    whitespace get a candidate set from their word parts and must be verified
+    against the full text by the caller.
 
+    Postings covering more than 1/64 of the rows are kept as row masks (smaller
+    than the equivalent array and cheap to union); the rest stay row arrays.
+    """
 
-def main() -> None:
-    args = parse_args()
-    catalog = load_catalog(args.catalog)
+    def __init__(self, records: Sequence[Switch]) -> None:
+        self.size = len(records)
+        # Catalog rows repeat the same strings and share pooled CLI blocks, so
+        # each distinct string and each distinct block is tokenized only once.
+        text_tokens: Dict[str, Tuple[str, ...]] = {}
+        block_tokens: Dict[int, Tuple[str, ...]] = {}
 
-    if args.ask:
-        print(answer_question(args.ask, catalog))
-        return
+        def tokens_of(text: str) -> Tuple[str, ...]:
+            tokens = text_tokens.get(text)
+            if tokens is None:
+                tokens = text_tokens[text] = tuple(set(_WORD_RE.findall(text.lower())))
+            return tokens
 
-    matches = filter_catalog(catalog, args)
+        def tokens_of_block(lines: Iterable[str], block: object) -> Tuple[str, ...]:
+            tokens = block_tokens.get(id(block))
+            if tokens is None:
+                tokens = block_tokens[id(block)] = tuple({token for line in lines for token in tokens_of(line)})
+            return tokens
 
-    if args.limit is not None:
-        matches = matches[: max(0, args.limit)]
+        postings: Dict[str, array] = {}
+        for row, sw in enumerate(records):
+            row_tokens = set(tokens_of_block(sw.troubleshooting, sw.troubleshooting))
+            row_tokens.update(
+                tokens_of_block((line for cmds in sw.cli_sections.values() for line in cmds), sw.cli_sections)
+            )
+            for text in (sw.vendor, sw.model, sw.layer, sw.uplink, sw.notes):
+                row_tokens.update(tokens_of(text))
+            for token in row_tokens:
+                posting = postings.get(token)
+                if posting is None:
+                    posting = postings[token] = array("I")
+                posting.append(row)
 
-    if args.output == "json":
-        json.dump([asdict(sw) for sw in matches], fp=sys.stdout, indent=2)
-        print()
-    else:
-        print(format_table(matches, include_cli=args.include_cli, group_by_vendor=args.group_by_vendor))
+        dense_threshold = self.size // 64
+        self.sparse: Dict[str, array] = {}
+        self.dense: Dict[str, int] = {}
+        for token, posting in postings.items():
+            if len(posting) > dense_threshold:
+                self.dense[token] = _mask_from_rows(posting, self.size)
+            else:
+                self.sparse[token] = posting
+
+    def _rows_containing(self, part: str) -> int:
+        mask = 0
+        for token, token_mask in self.dense.items():
+            if part in token:
+                mask |= token_mask
+        rows: List[int] = []
+        for token, posting in self.sparse.items():
+            if part in token:
+                rows.extend(posting)
+        return mask | _mask_from_rows(rows, self.size) if rows else mask
+
+    def lookup(self, keyword: str) -> Tuple[Optional[int], bool]:
+        """
+        Return ``(candidates, exact)`` for a keyword.
+
+        ``candidates`` is a row mask (``None`` when the keyword has no word
+        characters and the index cannot narrow the search); ``exact`` tells
+        whether the candidates already equal the matching rows.
+        """
+        needle = keyword.lower()
+        parts = _WORD_RE.findall(needle)
+        if not parts:
+            return None, False
+        candidates = (1 << self.size) - 1
+        for part in sorted(set(parts), key=len, reverse=True):
+            candidates &= self._rows_containing(part)
+            if not candidates:
+                break
+        return candidates, parts == [needle]
+
+    def estimate(self, keyword: str) -> Optional[int]:
+        """
+        Upper bound on the rows matching ``keyword``, from posting sizes alone.
+
+        A part's count sums the postings of every token containing it (rows
+        holding several such tokens are counted more than once); the rarest
+        part bounds the keyword. ``None`` when the keyword has no word characters.
+        """
+        parts = set(_WORD_RE.findall(keyword.lower()))
+        if not parts:
+            return None
+        bound = self.size
+        for part in parts:
+            count = sum(mask.bit_count() for token, mask in self.dense.items() if part in token)
+            count += sum(len(posting) for token, posting in self.sparse.items() if part in token)
+            bound = min(bound, count)
+        return bound
+
+
+def _trigrams(text: str) -> set:
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+def _posting_contains(posting: array, row: int) -> bool:
+    pos = bisect_left(posting, row)
+    return pos < len(posting) and posting[pos] == row
+
+
+class ModelIndex:
+    """Trigram index over lowercased model names for substring queries.
+
+    Any substring of three or more characters contains all of its trigrams, so
+    intersecting their (row-sorted) postings yields a small candidate set that
+    only needs a final ``needle in model`` check.
+    """
+
+    def __init__(self, models: Sequence[str], postings: Optional[Dict[str, array]] = None) -> None:
+        self.models = models
+        if postings is not None:
+            self.postings = postings
+            return
+        self.postings = {}
+        for row, model in enumerate(models):
+            for gram in _trigrams(model):
+                posting = self.postings.get(gram)
+                if posting is None:
+                    posting = self.postings[gram] = array("I")
+                posting.append(row)
+
+    def lookup(self, needle: str) -> Optional[List[int]]:
+        """Rows whose model contains ``needle`` (lowercased), or ``None`` if too short to index."""
+        grams = _trigrams(needle)
+        if not grams:
+            return None
+        postings = []
+        for gram in grams:
+            posting = self.postings.get(gram)
+            if posting is None:
+                return []
+            postings.append(posting)
+        postings.sort(key=len)
+
+        rows: Iterable[int] = postings[0]
+        for posting in postings[1:]:
+            rows = [row for row in rows if _posting_contains(posting, row)]
+        return [row for row in rows if needle in self.models[row]]
+
+
+class SwitchCatalog(Sequence[Switch]):
+    """
+    Immutable sequence of switches with a columnar index built once at load time.
+
+    ``version`` identifies the catalog contents for caches and HTTP ETags: the
+    source document's sha256 when there is one, otherwise the sha256 of the
+    records' JSON. Either way it is stable across processes.
+    """
+
+    def __init__(self, records: Iterable[Switch], version: Optional[str] = None) -> None:
+        self._records: Sequence[Switch] = tuple(records)
+        self._snapshot: Optional[CatalogSnapshot] = None
+        if version is not None:
+            self.version = version
+        self.columns = CatalogColumns(self._records)
+
+    @cached_property
+    def version(self) -> str:
+        digest = hashlib.sha256()
+        blocks = self._fragment_blocks[False]
+        for sw in self._records:
+            digest.update(switch_json(sw, False, blocks).encode("utf-8"))
+            digest.update(b"\n")
+        return digest.hexdigest()
+
+    @classmethod
+    def from_snapshot(cls, snapshot: "CatalogSnapshot") -> "SwitchCatalog":
+        """Catalog backed by a memory-mapped snapshot; records are decoded on access."""
+        columns = snapshot.load("columns")
+        catalog = cls.__new__(cls)
+        catalog._records = snapshot.records()
+        catalog._snapshot = snapshot
+        catalog.version = snapshot.header["key"]["sha256"]  # type: ignore[index]
+        catalog.columns = columns
+        return catalog
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __getitem__(self, index):  # type: ignore[override]
+        return self._records[index]
+
+    def __iter__(self) -> Iterator[Switch]:
+        return iter(self._records)
+
+    def _snapshot_section(self, name: str):
+        """Unpickle a snapshot section; ``None`` without a snapshot or when the section is unreadable."""
+        if self._snapshot is None:
+            return None
+        try:
+            return self._snapshot.load(name)
+        except Exception:  # a corrupt section must not fail the query: rebuild from the records
+            return None
+
+    def _store_section(self, name: str, obj: object) -> None:
+        """Add an index built from the records to the snapshot, if there is one."""
+        if self._snapshot is not None:
+            with contextlib.suppress(OSError):
+                self._snapshot.add_section(name, obj)
+
+    @cached_property
+    def keyword_index(self) -> KeywordIndex:
+        index = self._snapshot_section("keyword_index")
+        if index is None:
+            index = KeywordIndex(self._records)
+            self._store_section("keyword_index", index)
+        return index
+
+    @cached_property
+    def model_index(self) -> ModelIndex:
+        postings = self._snapshot_section("model_postings")
+        if postings is not None:
+            return ModelIndex(self.columns.model_lower, postings)
+        index = ModelIndex(self.columns.model_lower)
+        self._store_section("model_postings", index.postings)
+        return index
+
+    @cached_property
+    def _compact_fragments(self) -> List[Optional[str]]:
+        return [None] * len(self)
+
+    @cached_property
+    def _pretty_fragments(self) -> List[Optional[str]]:
+        return [None] * len(self)
+
+    @cached_property
+    def _fragment_blocks(self) -> Tuple[Dict[int, Tuple[object, str]], Dict[int, Tuple[object, str]]]:
+        return {}, {}
+
+    def json_fragment(self, row: int, pretty: bool = False) -> str:
+        """
+        Serialized JSON of one row (see ``switch_json``), computed once per catalog.
+
+        Snapshot-backed catalogs already store both forms.
+        """
+        if self._snapshot is not None:
+            return self._records.fragment(row, pretty)  # type: ignore[attr-defined]
+        cache = self._pretty_fragments if pretty else self._compact_fragments
+        fragment = cache[row]
+        if fragment is None:
+            fragment = cache[row] = switch_json(self._records[row], pretty, self._fragment_blocks[pretty])
+        return fragment
+
+    def field_reader(self, name: str) -> Callable[[int], object]:
+        """
+        Function mapping a row to its ``name`` field.
+
+        Fields held by the columns are read from them, so projecting onto them
+        never decodes or materializes the records.
+        """
+        columns = self.columns
+        if name in ("model", "ports", "uplink_count"):
+            return getattr(columns, name).__getitem__
+        if name in ("vendor", "layer"):
+            column: DictionaryColumn = getattr(columns, name)
+            values, codes = column.values, column.codes
+            return lambda row: values[codes[row]]
+        if name in ("poe", "managed", "stackable"):
+            test = _row_tester(getattr(columns, name), columns.size)
+            return lambda row: bool(test(row))
+        records = self._records
+        if name == "poe_budget":
+            budgets, known = columns.poe_budget, _row_tester(columns.has_poe_budget, columns.size)
+            verbatim = _row_tester(columns.poe_budget_verbatim, columns.size)
+            return lambda row: (budgets[row] if known(row) else None) if verbatim(row) else records[row].poe_budget
+        return lambda row: getattr(records[row], name)
+
+    def materialize(self, mask: int) -> List[Switch]:
+        """Switch objects for the rows selected by ``mask``, in catalog order."""
+        return [self._records[row] for row in _iter_mask(mask, len(self._records))]
+
+
+# ---------- Compiled catalog snapshots ----------
+
+# A snapshot is a compiled copy of a JSON catalog: the columns and search
+# indexes pickled whole, plus each record's compact and pretty JSON (see
+# ``switch_json``) addressed through offsets tables. Records are decoded from
+# the compact form, and both forms double as precomputed JSON output. It is
+# memory-mapped on load, so only the columns are decoded up front; indexes and
+# records are decoded when first used.
+#
+# Layout: magic, u64 header offset, u64 header length, sections, JSON header.
+
+SNAPSHOT_MAGIC = b"SWCSNAP\x00"
+SNAPSHOT_VERSION = 8
+_SNAPSHOT_PREAMBLE = struct.Struct("<8sQQ")
+
+
+def snapshot_dir() -> Path:
+    """Directory holding compiled snapshots (``SWITCH_CATALOG_CACHE_DIR`` overrides)."""
+    override = os.environ.get("SWITCH_CATALOG_CACHE_DIR")
+    if override:
+        return Path(override)
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "switch-catalog"
+
+
+def _file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class _SnapshotUnpickler(pickle.Unpickler):
+    """
+    Unpickle snapshot sections, resolving only the globals a snapshot contains.
+
+    This module's column and index classes resolve whether they were pickled
+    as ``app`` or ``__main__``. Anything else is refused, so a planted cache
+    file cannot run code.
+    """
+
+    _MODULE_CLASSES = frozenset({"CatalogColumns", "ColumnStats", "DictionaryColumn", "KeywordIndex", "RangeIndex"})
+    _ALLOWED = {
+        "array": frozenset({"array", "_array_reconstructor"}),
+        "builtins": frozenset({"bytearray", "bytes", "dict", "frozenset", "list", "set", "tuple"}),
+    }
+
+    def find_class(self, module: str, name: str):
+        if module in ("__main__", __name__) and name in self._MODULE_CLASSES:
+            return globals()[name]
+        if name in self._ALLOWED.get(module, ()):
+            return super().find_class(module, name)
+        raise pickle.UnpicklingError(f"snapshot refers to a disallowed global: {module}.{name}")
+
+
+class _FragmentTable:
+    """Variable-length UTF-8 fragments addressed by row through an offsets table."""
+
+    def __init__(self, blob: memoryview, offsets: memoryview) -> None:
+        self._blob = blob
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, row: int) -> str:
+        return bytes(self._blob[self._offsets[row] : self._offsets[row + 1]]).decode("utf-8")
+
+
+class _SnapshotRecords(Sequence[Switch]):
+    """Lazily decoded, memoized record list stored in a snapshot."""
+
+    def __init__(self, compact: _FragmentTable, pretty: _FragmentTable) -> None:
+        self._compact = compact
+        self._pretty = pretty
+        self._decoded: List[Optional[Switch]] = [None] * len(compact)
+        self._pool = BlockPool()
+
+    def __len__(self) -> int:
+        return len(self._decoded)
+
+    def __getitem__(self, index):  # type: ignore[override]
+        if isinstance(index, slice):
+            return tuple(self[row] for row in range(*index.indices(len(self))))
+        sw = self._decoded[index]
+        if sw is None:
+            row = index + len(self) if index < 0 else index
+            sw = self._decoded[row] = _switch_from_dict(json.loads(self.fragment(row)), self._pool)
+        return sw
+
+    def fragment(self, row: int, pretty: bool = False) -> str:
+        """The stored JSON of ``row`` (see ``switch_json``)."""
+        return self._pretty[row] if pretty else self._compact[row]
+
+
+class CatalogSnapshot:
+    """Memory-mapped snapshot file matching one source catalog."""
+
+    def __init__(self, path: Path, mapping: mmap.mmap, header: Dict[str, object]) -> None:
+        self.path = path
+        self.header = header
+        self._mapping = mapping
+        self._added: Dict[str, bytes] = {}  # sections stored since the file was mapped
+
+    @staticmethod
+    def location(source: Path) -> Path:
+        name = hashlib.sha256(str(source.resolve()).encode("utf-8")).hexdigest()[:24]
+        return snapshot_dir() / f"{name}.snap"
+
+    @staticmethod
+    def source_key(source: Path) -> Dict[str, object]:
+        stat = source.stat()
+        return {
+            "version": SNAPSHOT_VERSION,
+            "source": str(source.resolve()),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+        }
+
+    @classmethod
+    def open(cls, source: Path) -> Optional["CatalogSnapshot"]:
+        """
+        Map the snapshot for ``source`` if it is still valid.
+
+        Path, size and mtime are checked first; when only the mtime differs
+        the content hash decides, so touching a file does not force a rebuild.
+        A snapshot kept that way is re-keyed to the new mtime, so the next
+        load is back to the cheap check.
+        """
+        snapshot = cls.map(cls.location(source))
+        if snapshot is None:
+            return None
+        try:
+            key = cls.source_key(source)
+            stored = snapshot.header["key"]  # type: ignore[index]
+            if any(stored[name] != key[name] for name in ("version", "source", "size")):
+                raise ValueError("stale snapshot")
+            if stored["mtime_ns"] != key["mtime_ns"]:
+                if stored["sha256"] != _file_digest(source):
+                    raise ValueError("stale snapshot")
+                key["sha256"] = stored["sha256"]
+                with contextlib.suppress(OSError):
+                    snapshot.rekey(key)
+        except (OSError, ValueError, KeyError):
+            snapshot.close()
+            return None
+        return snapshot
+
+    @classmethod
+    def map(cls, path: Path) -> Optional["CatalogSnapshot"]:
+        """Map the snapshot file at ``path`` without checking it against its source."""
+        try:
+            with path.open("rb") as handle:
+                mapping = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        try:
+            magic, header_offset, header_length = _SNAPSHOT_PREAMBLE.unpack_from(mapping, 0)
+            if magic != SNAPSHOT_MAGIC:
+                raise ValueError("not a catalog snapshot")
+            header = json.loads(mapping[header_offset : header_offset + header_length])
+            if header["key"]["version"] != SNAPSHOT_VERSION:
+                raise ValueError("snapshot from another format version")
+        except (ValueError, KeyError, TypeError, struct.error):
+            mapping.close()
+            return None
+        return cls(path, mapping, header)
+
+    def close(self) -> None:
+        self._mapping.close()
+
+    def discard(self) -> None:
+        """Close and delete an unusable snapshot file."""
+        with contextlib.suppress(BufferError):
+            self.close()
+        with contextlib.suppress(OSError):
+            self.path.unlink()
+
+    def rekey(self, key: Dict[str, object]) -> None:
+        """Store ``key`` as the snapshot's source key."""
+        self._rewrite(key, self._added)
+        self.header = dict(self.header, key=key)
+
+    def add_section(self, name: str, obj: object) -> None:
+        """
+        Store ``obj`` as section ``name`` of the snapshot file.
+
+        The mapping of this process is left as it is; the section is read by
+        the next process that maps the file.
+        """
+        self._added[name] = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+        self._rewrite(self.header["key"], self._added)  # type: ignore[arg-type]
+
+    def _rewrite(self, key: Dict[str, object], extra: Dict[str, bytes]) -> None:
+        """
+        Rewrite the file with ``key`` as its source key and ``extra`` sections appended.
+
+        The file is rewritten to a temporary copy and swapped in atomically,
+        so processes that still map the old file are unaffected.
+        """
+        _, header_offset, _ = _SNAPSHOT_PREAMBLE.unpack_from(self._mapping, 0)
+        sections = dict(self.header["sections"])  # type: ignore[arg-type]
+        with tempfile.NamedTemporaryFile(dir=self.path.parent, suffix=".tmp", delete=False) as handle:
+            try:
+                handle.write(_SNAPSHOT_PREAMBLE.pack(SNAPSHOT_MAGIC, 0, 0))
+                with memoryview(self._mapping) as view, view[_SNAPSHOT_PREAMBLE.size : header_offset] as body:
+                    handle.write(body)
+                for name, blob in extra.items():
+                    handle.write(b"\x00" * (-handle.tell() % 8))
+                    sections[name] = (handle.tell(), len(blob))
+                    handle.write(blob)
+                header = json.dumps(dict(self.header, key=key, sections=sections)).encode("utf-8")
+                offset = handle.tell()
+                handle.write(header)
+                handle.seek(0)
+                handle.write(_SNAPSHOT_PREAMBLE.pack(SNAPSHOT_MAGIC, offset, len(header)))
+            except BaseException:
+                handle.close()
+                os.unlink(handle.name)
+                raise
+        os.replace(handle.name, self.path)
+
+    def _section(self, name: str) -> memoryview:
+        offset, length = self.header["sections"][name]  # type: ignore[index]
+        return memoryview(self._mapping)[offset : offset + length]
+
+    def load(self, name: str):
+        with self._section(name) as section:
+            return _SnapshotUnpickler(io.BytesIO(section)).load()
+
+    def records(self) -> _SnapshotRecords:
+        return _SnapshotRecords(
+            _FragmentTable(self._section("records"), self._section("offsets").cast("Q")),
+            _FragmentTable(self._section("pretty_records"), self._section("pretty_offsets").cast("Q")),
+        )
+
+    @classmethod
+    def write(cls, catalog: SwitchCatalog, source: Path, key: Dict[str, object]) -> None:
+        """
+        Compile ``catalog`` into the snapshot file for ``source``, atomically.
+
+        ``key`` is the source key (with ``sha256``) of the bytes ``catalog``
+        was parsed from; see ``_read_catalog``.
+        """
+        target = cls.location(source)
+        target.parent.mkdir(parents=True, exist_ok=True)
+
+        sections: Dict[str, Tuple[int, int]] = {}
+        with tempfile.NamedTemporaryFile(dir=target.parent, suffix=".tmp", delete=False) as handle:
+            try:
+                handle.write(_SNAPSHOT_PREAMBLE.pack(SNAPSHOT_MAGIC, 0, 0))
+
+                def add_section(name: str, chunks: Iterable[bytes]) -> None:
+                    handle.write(b"\x00" * (-handle.tell() % 8))
+                    start = handle.tell()
+                    for chunk in chunks:
+                        handle.write(chunk)
+                    sections[name] = (start, handle.tell() - start)
+
+                def pickled(obj: object) -> List[bytes]:
+                    return [pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)]
+
+                add_section("columns", pickled(catalog.columns))
+                # Indexes this load did not need are left out; the first load that builds one stores it.
+                if "keyword_index" in catalog.__dict__:
+                    add_section("keyword_index", pickled(catalog.keyword_index))
+                if "model_index" in catalog.__dict__:
+                    add_section("model_postings", pickled(catalog.model_index.postings))
+
+                for prefix, pretty in (("", False), ("pretty_", True)):
+                    offsets = array("Q", [0])
+                    blocks: Dict[int, Tuple[object, str]] = {}
+
+                    def record_chunks() -> Iterator[bytes]:
+                        for sw in catalog:
+                            blob = switch_json(sw, pretty, blocks).encode("utf-8")
+                            offsets.append(offsets[-1] + len(blob))
+                            yield blob
+
+                    add_section(f"{prefix}records", record_chunks())
+                    add_section(f"{prefix}offsets", [offsets.tobytes()])
+
+                header = json.dumps({"key": key, "sections": sections}).encode("utf-8")
+                header_offset = handle.tell()
+                handle.write(header)
+                handle.seek(0)
+                handle.write(_SNAPSHOT_PREAMBLE.pack(SNAPSHOT_MAGIC, header_offset, len(header)))
+            except BaseException:
+                handle.close()
+                os.unlink(handle.name)
+                raise
+        os.replace(handle.name, target)
+
+
+def _switch_from_dict(item: Dict[str, object], pool: Optional[BlockPool] = None) -> Switch:
+    """Build a record from its JSON mapping, sharing blocks through ``pool`` when given."""
+    cli_sections = item.get("cli_sections", {})
+    troubleshooting = item.get("troubleshooting", [])
+    if pool is not None:
+        cli_sections, troubleshooting = pool.sections(cli_sections), pool.lines(troubleshooting)  # type: ignore[arg-type]
+    return Switch(
+        vendor=item["vendor"],
+        model=item["model"],
+        ports=int(item["ports"]),
+        poe=bool(item["poe"]),
+        layer=item["layer"],
+        managed=bool(item["managed"]),
+        stackable=bool(item["stackable"]),
+        uplink=item.get("uplink", "N/A"),
+        uplink_count=int(item.get("uplink_count", 0)),
+        poe_budget=item.get("poe_budget"),
+        cli_sections=cli_sections,
+        troubleshooting=troubleshooting,
+        notes=item.get("notes", ""),
+    )
+
+
+# ---------- Streaming catalog readers ----------
+
+JSON_LINES_SUFFIXES = (".jsonl", ".ndjson")
+_JSON_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_JSON_DELIMITER = re.compile(r"[ \t\n\r,\]]")
+
+
+def _iter_json_array(handle: TextIO, chunk_size: int = 1 << 16) -> Iterator[object]:
+    """
+    Decode the elements of a top-level JSON array one at a time.
+
+    Only the undecoded tail of the input is buffered, so memory stays bounded
+    by the largest single element rather than the whole document.
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = "", 0, False
+
+    def read_more() -> None:
+        nonlocal buffer, pos, eof
+        chunk = handle.read(max(chunk_size, len(buffer) - pos))
+        eof = not chunk
+        buffer, pos = buffer[pos:] + chunk, 0
+
+    def next_char() -> str:
+        nonlocal pos
+        while True:
+            pos = _JSON_WHITESPACE.match(buffer, pos).end()  # type: ignore[union-attr]
+            if pos < len(buffer) or eof:
+                return buffer[pos : pos + 1]
+            read_more()
+
+    if next_char() != "[":
+        raise ValueError("Catalog JSON must be a top-level array of switch objects.")
+    pos += 1
+    if next_char() == "]":
+        return
+    while True:
+        next_char()
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            read_more()
+            continue
+        if not eof and not isinstance(item, (dict, list, str)) and not _JSON_DELIMITER.search(buffer, pos):
+            # A number cut at the buffer edge decodes "successfully"; re-read it whole.
+            read_more()
+            continue
+        yield item
+        pos = end
+        delimiter = next_char()
+        pos += 1
+        if delimiter == "]":
+            if next_char():
+                raise ValueError("Unexpected data after the catalog array.")
+            return
+        if delimiter != ",":
+            raise ValueError(f"Expected ',' or ']' in catalog array, found {delimiter!r}.")
+
+
+def _iter_records(handle: TextIO, json_lines: bool) -> Iterator[Dict[str, object]]:
+    if json_lines:
+        for line in handle:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        yield from _iter_json_array(handle)  # type: ignore[misc]
+
+
+def iter_catalog_records(path: Path) -> Iterator[Dict[str, object]]:
+    """Yield raw switch records from a JSON array or JSON Lines (``.jsonl``) catalog."""
+    with path.open(encoding="utf-8") as handle:
+        yield from _iter_records(handle, path.suffix.lower() in JSON_LINES_SUFFIXES)
+
+
+class _DigestReader(io.RawIOBase):
+    """Binary reader feeding every byte it returns into ``digest``."""
+
+    def __init__(self, raw, digest) -> None:
+        self._raw = raw
+        self._digest = digest
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        count = self._raw.readinto(buffer)
+        if count:
+            self._digest.update(memoryview(buffer)[:count])
+        return count
+
+
+def _read_catalog(source: Path) -> Tuple[SwitchCatalog, Dict[str, object]]:
+    """
+    Parse ``source`` into a catalog plus the snapshot key of exactly the bytes parsed.
+
+    The stat half of the key is taken before reading and the hash covers the
+    bytes as they are read, so a file replaced mid-parse can never pair the
+    old records with the new file's hash. The catalog is versioned by that hash.
+    """
+    key = CatalogSnapshot.source_key(source)
+    digest = hashlib.sha256()
+    with source.open("rb") as raw:
+        binary = io.BufferedReader(_DigestReader(raw, digest))
+        handle = io.TextIOWrapper(binary, encoding="utf-8")
+        pool = BlockPool()
+        json_lines = source.suffix.lower() in JSON_LINES_SUFFIXES
+        catalog = SwitchCatalog(_switch_from_dict(item, pool) for item in _iter_records(handle, json_lines))
+        while binary.read(1 << 20):
+            pass  # hash whatever the parser did not need to read
+    key["sha256"] = catalog.version = digest.hexdigest()
+    return catalog, key
+
+
+def iter_catalog(path: Path) -> Iterator[Switch]:
+    """Stream ``Switch`` objects from a catalog file, one record in memory at a time."""
+    pool = BlockPool()
+    for item in iter_catalog_records(path):
+        yield _switch_from_dict(item, pool)
+
+
+def load_catalog_bytes(data: bytes, json_lines: Optional[bool] = None) -> SwitchCatalog:
+    """
+    Build a catalog from an in-memory JSON array or JSON Lines document (e.g. an upload).
+
+    ``json_lines=None`` sniffs the format from the first non-blank byte. The
+    catalog version is the content's sha256, like a file catalog's, so equal
+    documents share query cache entries.
+    """
+    if json_lines is None:
+        json_lines = data.lstrip()[:1] == b"{"
+    handle = io.TextIOWrapper(io.BytesIO(data), encoding="utf-8")
+    pool = BlockPool()
+    records = (_switch_from_dict(item, pool) for item in _iter_records(handle, json_lines))
+    return SwitchCatalog(records, version=hashlib.sha256(data).hexdigest())
+
+
+def load_catalog(path: Optional[str], use_cache: bool = True) -> SwitchCatalog:
+    """
+    Load a JSON or JSON Lines catalog, or the built-in one when ``path`` is empty.
+
+    Records are streamed straight into the catalog builder. With ``use_cache``
+    the first load compiles a snapshot (see ``CatalogSnapshot``) and later loads
+    of the unchanged file map it instead of re-parsing. Snapshot I/O problems
+    never fail the load.
+    """
+    if not path:
+        return SwitchCatalog(default_catalog())
+
+    source = Path(path)
+    if use_cache:
+        snapshot = CatalogSnapshot.open(source)
+        if snapshot is not None:
+            try:
+                return SwitchCatalog.from_snapshot(snapshot)
+            except Exception:
+                snapshot.discard()  # corrupt or foreign file: rebuild it below
+
+    catalog, key = _read_catalog(source)
+    if use_cache:
+        with contextlib.suppress(OSError):
+            # A file replaced while it was parsed is left for the next load to compile.
+            if all(CatalogSnapshot.source_key(source)[name] == key[name] for name in ("size", "mtime_ns")):
+                CatalogSnapshot.write(catalog, source, key)
+    return catalog
+
+
+# ---------- Filter evaluation and query cache ----------
+
+
+def _folded(value: Optional[str]) -> Optional[str]:
+    return value.lower() if value else None
+
+
+def _selector(value: Optional[str]) -> Optional[bool]:
+    if value is None:
+        return None
+    return {"yes": True, "no": False}.get(value.lower())
+
+
+@dataclass(frozen=True)
+class FilterSpec:
+    """
+    Normalized filter arguments.
+
+    Text filters are lowercased (matching is case-insensitive), yes/no
+    selectors become booleans and "no filter" is always ``None``, so two specs
+    compare equal exactly when they select the same rows. Output-only options
+    (``--output``, ``--include-cli``, ``--limit``...) are not part of a spec.
+    """
+
+    vendor: Optional[str] = None
+    model: Optional[str] = None
+    keyword: Optional[str] = None
+    layer: Optional[str] = None
+    min_ports: Optional[int] = None
+    max_ports: Optional[int] = None
+    min_poe_budget: Optional[int] = None
+    max_poe_budget: Optional[int] = None
+    min_uplinks: Optional[int] = None
+    poe: Optional[bool] = None
+    managed: Optional[bool] = None
+    stackable: Optional[bool] = None
+
+    @classmethod
+    def from_args(cls, args: argparse.Namespace) -> "FilterSpec":
+        return cls(
+            vendor=_folded(args.vendor),
+            model=_folded(args.model),
+            keyword=_folded(args.keyword),
+            layer=_folded(args.layer),
+            min_ports=args.min_ports or None,
+            max_ports=args.max_ports or None,
+            min_poe_budget=getattr(args, "min_poe_budget", None),
+            max_poe_budget=getattr(args, "max_poe_budget", None),
+            min_uplinks=getattr(args, "min_uplinks", None),
+            poe=_selector(args.poe),
+            managed=_selector(args.managed),
+            stackable=_selector(args.stackable),
+        )
+
+    def narrows(self, other: "FilterSpec") -> bool:
+        """
+        True when every row matching ``self`` also matches ``other``.
+
+        Equality filters must agree or be unset in ``other``, bounds may only
+        tighten, and substring filters may only grow (a longer needle
+        containing the old one matches a subset of its rows).
+        """
+        for name in ("vendor", "layer", "poe", "managed", "stackable"):
+            wanted = getattr(other, name)
+            if wanted is not None and getattr(self, name) != wanted:
+                return False
+        for name in ("model", "keyword"):
+            needle, narrower = getattr(other, name), getattr(self, name)
+            if needle is not None and (narrower is None or needle not in narrower):
+                return False
+        for name in ("min_ports", "min_poe_budget", "min_uplinks"):
+            bound, narrower = getattr(other, name), getattr(self, name)
+            if bound is not None and (narrower is None or narrower < bound):
+                return False
+        for name in ("max_ports", "max_poe_budget"):
+            bound, narrower = getattr(other, name), getattr(self, name)
+            if bound is not None and (narrower is None or narrower > bound):
+                return False
+        return True
+
+
+# Relative per-row cost of each kind of predicate, used to order a plan.
+BITMAP_COST = 1.0
+RANGE_INDEX_COST = 2.0
+INDEX_LOOKUP_COST = 8.0
+KEYWORD_LOOKUP_COST = 16.0
+# Selectivities assumed when no statistics are at hand; --explain flags them.
+KEYWORD_GUESS_SELECTIVITY = 0.1
+SHORT_MODEL_GUESS_SELECTIVITY = 0.5
+# Below this many surviving rows, checking rows directly beats an index lookup.
+ROW_CHECK_THRESHOLD = 512
+
+
+RowCheck = Callable[[int], bool]
+
+
+@dataclass
+class PlanStep:
+    """
+    One predicate of a query plan.
+
+    ``apply`` narrows a row mask and returns it together with an optional
+    per-row check the remaining candidates must still pass (``None`` when the
+    narrowed mask is already exact), so costly checks can run lazily.
+    """
+
+    label: str
+    cost: float
+    selectivity: float
+    apply: Callable[[int], Tuple[int, Optional[RowCheck]]]
+    # True when ``selectivity`` is a fixed assumption rather than a statistic.
+    guessed: bool = False
+
+    @property
+    def rank(self) -> float:
+        # Classic predicate ordering: cheap predicates that discard many rows first.
+        return self.cost / max(1e-9, 1.0 - self.selectivity)
+
+
+class QueryPlan:
+    """Predicates of a ``FilterSpec`` ordered by estimated cost and selectivity."""
+
+    def __init__(self, catalog: SwitchCatalog, spec: FilterSpec, within: Optional[int] = None) -> None:
+        self.catalog = catalog
+        self.spec = spec
+        # Rows already known to contain every match (e.g. a broader cached result).
+        self.within = catalog.columns.all_rows if within is None else within
+        self.steps = sorted(self._steps(), key=lambda step: step.rank)
+        self.actual_rows: List[Optional[int]] = []
+
+    def _steps(self) -> Iterator[PlanStep]:
+        catalog, spec = self.catalog, self.spec
+        columns, stats = catalog.columns, catalog.columns.stats
+        rows = max(1, stats.rows)
+
+        def fraction(count: int) -> float:
+            return count / rows
+
+        if spec.vendor:
+            yield PlanStep(
+                f"vendor = {spec.vendor}",
+                BITMAP_COST,
+                fraction(stats.vendor_counts.get(spec.vendor, 0)),
+                lambda mask: (mask & columns.vendor.mask_for(spec.vendor), None),
+            )
+        if spec.layer:
+            yield PlanStep(
+                f"layer = {spec.layer}",
+                BITMAP_COST,
+                fraction(stats.layer_counts.get(spec.layer, 0)),
+                lambda mask: (mask & columns.layer.mask_for(spec.layer), None),
+            )
+        for name in ("poe", "managed", "stackable"):
+            wanted = getattr(spec, name)
+            if wanted is not None:
+                true_count = stats.true_counts[name]
+                selected = columns.bool_mask(getattr(columns, name), wanted)
+                yield PlanStep(
+                    f"{name} = {'yes' if wanted else 'no'}",
+                    BITMAP_COST,
+                    fraction(true_count if wanted else stats.rows - true_count),
+                    lambda mask, selected=selected: (mask & selected, None),
+                )
+        ranges = (
+            ("ports", columns.ports_index, spec.min_ports, spec.max_ports),
+            ("poe_budget", columns.poe_budget_index, spec.min_poe_budget, spec.max_poe_budget),
+            ("uplinks", columns.uplink_index, spec.min_uplinks, None),
+        )
+        for name, index, low, high in ranges:
+            if low is None and high is None:
+                continue
+            bounds = [f"{name} >= {low}"] if low is not None else []
+            bounds += [f"{name} <= {high}"] if high is not None else []
+            yield PlanStep(
+                " and ".join(bounds),
+                RANGE_INDEX_COST,
+                fraction(index.count(low, high)),
+                lambda mask, index=index, low=low, high=high: (mask & index.mask(low, high), None),
+            )
+        if spec.model:
+            selectivity, guessed = self._model_selectivity(spec.model)
+            yield PlanStep(
+                f"model contains {spec.model!r}",
+                INDEX_LOOKUP_COST,
+                selectivity,
+                self._apply_model,
+                guessed,
+            )
+        if spec.keyword:
+            selectivity, guessed = self._keyword_selectivity(spec.keyword)
+            yield PlanStep(
+                f"keyword {spec.keyword!r}",
+                KEYWORD_LOOKUP_COST,
+                selectivity,
+                self._apply_keyword,
+                guessed,
+            )
+
+    def _model_selectivity(self, needle: str) -> Tuple[float, bool]:
+        """``(selectivity, guessed)`` for a model substring, from its rarest trigram."""
+        grams = _trigrams(needle)
+        if not grams:
+            return SHORT_MODEL_GUESS_SELECTIVITY, True
+        postings = self.catalog.model_index.postings
+        return min(len(postings.get(gram, ())) for gram in grams) / max(1, self.catalog.columns.size), False
+
+    def _keyword_selectivity(self, keyword: str) -> Tuple[float, bool]:
+        """
+        ``(selectivity, guessed)`` for a keyword.
+
+        Posting sizes are used when the keyword index is already loaded;
+        planning never builds it just for an estimate.
+        """
+        index = self.catalog.__dict__.get("keyword_index")
+        if index is not None:
+            count = index.estimate(keyword)
+            if count is not None:
+                return count / max(1, index.size), False
+        return KEYWORD_GUESS_SELECTIVITY, True
+
+    def _apply_model(self, mask: int) -> Tuple[int, Optional[RowCheck]]:
+        if mask.bit_count() > ROW_CHECK_THRESHOLD:
+            rows = self.catalog.model_index.lookup(self.spec.model)  # type: ignore[arg-type]
+            if rows is not None:
+                return mask & _mask_from_rows(rows, self.catalog.columns.size), None
+        return mask, self._model_check(self.catalog, self.spec.model)  # type: ignore[arg-type]
+
+    def _apply_keyword(self, mask: int) -> Tuple[int, Optional[RowCheck]]:
+        if mask.bit_count() > ROW_CHECK_THRESHOLD:
+            candidates, exact = self.catalog.keyword_index.lookup(self.spec.keyword)  # type: ignore[arg-type]
+            if candidates is not None:
+                mask &= candidates
+            if exact:
+                return mask, None
+        return mask, self._keyword_check(self.catalog, self.spec.keyword)  # type: ignore[arg-type]
+
+    @staticmethod
+    def _model_check(catalog: SwitchCatalog, needle: str) -> RowCheck:
+        models = catalog.columns.model_lower
+        return lambda row: needle in models[row]
+
+    @staticmethod
+    def _keyword_check(catalog: SwitchCatalog, keyword: str) -> RowCheck:
+        return lambda row: catalog[row].matches_keyword(keyword)
+
+    @staticmethod
+    def text_checks(catalog: SwitchCatalog, spec: FilterSpec) -> List[RowCheck]:
+        """
+        Index-free row checks for ``spec``'s text predicates (model, keyword).
+
+        Static so callers can get them without planning, which would read the
+        indexes for selectivity estimates.
+        """
+        checks = [QueryPlan._model_check(catalog, spec.model)] if spec.model else []
+        return checks + ([QueryPlan._keyword_check(catalog, spec.keyword)] if spec.keyword else [])
+
+    def _narrow(self, eager: bool) -> Tuple[int, List[RowCheck]]:
+        """
+        Apply every step's mask; run row checks now (``eager``) or return them.
+
+        Row counts per step are recorded for ``explain``; once a check has been
+        deferred the counts are no longer exact and are recorded as ``None``.
+        """
+        columns = self.catalog.columns
+        mask = self.within
+        checks: List[RowCheck] = []
+        self.actual_rows = []
+        for step in self.steps:
+            if not mask:
+                self.actual_rows.append(None)
+                continue
+            mask, check = step.apply(mask)
+            if check is not None:
+                if eager:
+                    mask = columns.refine(mask, check)
+                else:
+                    checks.append(check)
+            self.actual_rows.append(None if checks else mask.bit_count())
+        return mask, checks
+
+    def execute(self, workers: Optional[int] = None) -> int:
+        """
+        Run the plan and return the matching row mask.
+
+        Row checks left after the cheap steps are sharded across processes
+        when ``shard_workers`` allows it and enough candidates remain.
+        """
+        workers = shard_workers(self.catalog, workers)
+        if workers > 1:
+            mask, checks = self._narrow(eager=False)
+            if checks and mask.bit_count() >= SHARD_MIN_CHECK_ROWS:
+                return select_sharded(self.catalog, self.spec, mask, workers)
+        return self._narrow(eager=True)[0]
+
+    def iter_rows(self) -> Iterator[int]:
+        """Yield matching rows in catalog order, running row checks only as rows are consumed."""
+        mask, checks = self._narrow(eager=False)
+        for row in _iter_mask(mask, self.catalog.columns.size):
+            if all(check(row) for check in checks):
+                yield row
+
+    def explain(self) -> str:
+        """
+        Describe the plan with estimated vs actual rows after each step (executes it).
+
+        Steps whose selectivity is assumed rather than taken from statistics
+        are marked; estimates after such a step inherit the guess.
+        """
+        self._narrow(eager=True)
+        estimate = float(self.catalog.columns.size)
+        lines = [f"Query plan over {self.catalog.columns.size} rows:"]
+        if not self.steps:
+            lines.append("  (no filters: all rows)")
+        for number, (step, actual) in enumerate(zip(self.steps, self.actual_rows), start=1):
+            estimate *= step.selectivity
+            lines.append(
+                f"  {number}. {step.label:<40} est {estimate:>10.1f} rows   "
+                f"actual {'skipped' if actual is None else actual}"
+                + ("   (selectivity guessed)" if step.guessed else "")
+            )
+        return "\n".join(lines)
+
+
+# ---------- Sharded row checks (process pool) ----------
+
+# Bitmap and index steps are cheap; what stays CPU-bound is the per-row
+# checks left over (e.g. multi-word keywords verified against each record's
+# text). For snapshot-backed catalogs those checks can be split across a
+# process pool: every worker maps the same snapshot file (pages are shared
+# through the OS page cache, nothing is pickled but specs and row masks),
+# refines one shard of the candidate rows, and the parent ORs the shard masks
+# back together, which keeps catalog order by construction.
+
+# Catalogs with at least this many rows shard automatically (``--workers``
+# overrides), and only when this many candidates still need row checks.
+SHARD_AUTO_MIN_ROWS = 100_000
+SHARD_MIN_CHECK_ROWS = 20_000
+# Shards per worker, so a slow shard does not leave the other workers idle.
+SHARDS_PER_WORKER = 4
+
+
+class _ShardPool:
+    """A worker pool with the number of queries currently mapping shards on it."""
+
+    __slots__ = ("version", "workers", "executor", "users", "retired")
+
+    def __init__(self, version: str, workers: int, executor: ProcessPoolExecutor) -> None:
+        self.version = version
+        self.workers = workers
+        self.executor = executor
+        self.users = 0
+        self.retired = False
+
+
+# One pool per snapshot path; guarded by ``_SHARD_POOLS_LOCK``, like the pools' user counts.
+_SHARD_POOLS: Dict[str, _ShardPool] = {}
+_SHARD_POOLS_LOCK = threading.Lock()
+_SHARD_CATALOG: Optional[SwitchCatalog] = None
+
+
+def shard_workers(catalog: SwitchCatalog, workers: Optional[int] = None) -> int:
+    """
+    Processes to use for ``catalog``'s row checks.
+
+    ``workers`` wins when given (capped at the CPU count); otherwise large
+    catalogs use every CPU. Only snapshot-backed catalogs can be shared with
+    workers, so others get 1.
+    """
+    if catalog._snapshot is None:
+        return 1
+    cpus = os.cpu_count() or 1
+    if workers is None:
+        return cpus if len(catalog) >= SHARD_AUTO_MIN_ROWS else 1
+    return max(1, min(workers, cpus))
+
+
+def _init_shard_worker(snapshot_path: str, version: str) -> None:
+    global _SHARD_CATALOG
+    snapshot = CatalogSnapshot.map(Path(snapshot_path))
+    if snapshot is None or snapshot.header["key"].get("sha256") != version:  # type: ignore[index, union-attr]
+        raise RuntimeError(f"snapshot {snapshot_path} changed under the worker pool")
+    _SHARD_CATALOG = SwitchCatalog.from_snapshot(snapshot)
+
+
+def _refine_shard(spec: FilterSpec, candidates: int) -> int:
+    # Candidates already passed every cheap step in the parent, so only the
+    # text predicates are left. The checks are built without a QueryPlan,
+    # whose estimates would unpickle the search indexes in every worker.
+    assert _SHARD_CATALOG is not None, "worker was not initialized"
+    checks = QueryPlan.text_checks(_SHARD_CATALOG, spec)
+    return _SHARD_CATALOG.columns.refine(candidates, lambda row: all(check(row) for check in checks))
+
+
+def _shard_pool_context() -> Optional[multiprocessing.context.BaseContext]:
+    # Pools are started from threaded servers (daemon, HTTP API), where
+    # forking the whole process is unsafe; forkserver children are forked
+    # from a clean single-threaded server instead.
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return None
+
+
+@contextlib.contextmanager
+def _shard_pool(catalog: SwitchCatalog, workers: int) -> Iterator[ProcessPoolExecutor]:
+    """
+    Use the worker pool for ``catalog``'s snapshot, with at least ``workers`` processes.
+
+    A snapshot path keeps a single pool: a new catalog version or a larger
+    worker count replaces it. A replaced pool is shut down only once the
+    last query using it is done, so no query ever maps onto a closed pool.
+    """
+    snapshot = catalog._snapshot
+    assert snapshot is not None
+    path = str(snapshot.path)
+    with _SHARD_POOLS_LOCK:
+        pool = _SHARD_POOLS.get(path)
+        if pool is None or pool.version != catalog.version or pool.workers < workers:
+            if pool is not None:
+                _retire_shard_pool(pool)
+            executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=_shard_pool_context(),
+                initializer=_init_shard_worker,
+                initargs=(path, catalog.version),
+            )
+            pool = _SHARD_POOLS[path] = _ShardPool(catalog.version, workers, executor)
+        pool.users += 1
+    try:
+        yield pool.executor
+    finally:
+        with _SHARD_POOLS_LOCK:
+            pool.users -= 1
+            if pool.retired:
+                _retire_shard_pool(pool)
+
+
+def _retire_shard_pool(pool: _ShardPool) -> None:
+    # Called with ``_SHARD_POOLS_LOCK`` held; queued shards still finish.
+    pool.retired = True
+    if pool.users == 0:
+        pool.executor.shutdown(wait=False)
+
+
+def _shutdown_shard_pools() -> None:
+    with _SHARD_POOLS_LOCK:
+        pools = list(_SHARD_POOLS.values())
+        _SHARD_POOLS.clear()
+    for pool in pools:
+        pool.executor.shutdown()
+
+
+atexit.register(_shutdown_shard_pools)
+
+
+def select_sharded(catalog: SwitchCatalog, spec: FilterSpec, candidates: int, workers: int) -> int:
+    """Refine ``candidates`` (rows passing the plan's cheap steps) on ``workers`` processes."""
+    size = len(catalog)
+    shard_count = max(1, min(workers * SHARDS_PER_WORKER, candidates.bit_count() // ROW_CHECK_THRESHOLD))
+    bounds = [size * shard // shard_count for shard in range(shard_count + 1)]
+    shards = [
+        candidates & (((1 << (end - start)) - 1) << start) for start, end in zip(bounds, bounds[1:]) if end > start
+    ]
+    mask = 0
+    with _shard_pool(catalog, workers) as executor:
+        for part in executor.map(_refine_shard, itertools.repeat(spec), shards):
+            mask |= part
+    return mask
+
+
+def select_rows(
+    catalog: SwitchCatalog, spec: FilterSpec, workers: Optional[int] = None, within: Optional[int] = None
+) -> int:
+    """Row mask of the catalog entries matching ``spec`` (see ``QueryPlan.execute``)."""
+    return QueryPlan(catalog, spec, within).execute(workers)
+
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+
+class QueryCache:
+    """
+    Bounded LRU cache of filter results (row masks).
+
+    Entries are keyed on ``(catalog.version, FilterSpec)``: a changed catalog
+    gets a new version, so its stale entries can never be returned and simply
+    age out of the LRU order.
+    """
+
+    def __init__(self, maxsize: int = 256) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, FilterSpec], int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def select(self, catalog: SwitchCatalog, spec: FilterSpec, workers: Optional[int] = None) -> int:
+        """Cached ``select_rows(catalog, spec, workers)``."""
+        key = (catalog.version, spec)
+        mask = self._lookup(key)
+        if mask is None:
+            mask = select_rows(catalog, spec, workers, within=self._broader(key))
+            self._store(key, mask)
+        return mask
+
+    def iter_rows(self, catalog: SwitchCatalog, spec: FilterSpec) -> Iterator[int]:
+        """
+        Stream the rows matching ``spec``, from the cache when possible.
+
+        On a miss the plan runs lazily; its result is cached only if the
+        caller consumes the whole stream (an early stop leaves no entry).
+        """
+        key = (catalog.version, spec)
+        mask = self._lookup(key)
+        if mask is not None:
+            yield from _iter_mask(mask, len(catalog))
+            return
+
+        rows: List[int] = []
+        for row in QueryPlan(catalog, spec, within=self._broader(key)).iter_rows():
+            rows.append(row)
+            yield row
+        self._store(key, _mask_from_rows(rows, len(catalog)))
+
+    def _broader(self, key: Tuple[str, FilterSpec]) -> Optional[int]:
+        """
+        Smallest cached result of the same catalog that ``key``'s spec narrows.
+
+        Refining it instead of the whole catalog makes a step-by-step search
+        (vendor, then PoE, then more ports...) cost in proportion to the
+        previous match count.
+        """
+        version, spec = key
+        best: Optional[int] = None
+        with self._lock:
+            for (cached_version, cached_spec), mask in self._entries.items():
+                if cached_version == version and spec.narrows(cached_spec):
+                    if best is None or mask.bit_count() < best.bit_count():
+                        best = mask
+        return best
+
+    def _lookup(self, key: Tuple[str, FilterSpec]) -> Optional[int]:
+        with self._lock:
+            mask = self._entries.get(key)
+            if mask is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return mask
+
+    def _store(self, key: Tuple[str, FilterSpec], mask: int) -> None:
+        with self._lock:
+            self._entries[key] = mask
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def info(self) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self._entries))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+
+QUERY_CACHE = QueryCache()
+
+
+def iter_filter_rows(catalog: SwitchCatalog, spec: FilterSpec, workers: Optional[int] = 1) -> Iterator[int]:
+    """
+    Yield the catalog rows matching ``spec``, through the shared query cache.
+
+    With a single worker (the default) rows are produced lazily, so an early
+    stop skips the remaining row checks. Otherwise the whole result is
+    computed first, sharding the row checks (``workers=None``: automatic).
+    """
+    if shard_workers(catalog, workers) > 1:
+        return _iter_mask(QUERY_CACHE.select(catalog, spec, workers), len(catalog))
+    return QUERY_CACHE.iter_rows(catalog, spec)
+
+
+def iter_filter_catalog(catalog: Iterable[Switch], args: argparse.Namespace) -> Iterator[Switch]:
+    """
+    Lazily yield the switches matching ``args``, in catalog order.
+
+    Consumers that stop early (e.g. ``--limit``) skip the remaining row checks
+    and never materialize the remaining records.
+    """
+    spec = FilterSpec.from_args(args)
+    if not isinstance(catalog, SwitchCatalog):
+        # A throwaway wrapper would only fill the cache with unreachable entries.
+        catalog = SwitchCatalog(catalog)
+        rows = QueryPlan(catalog, spec).iter_rows()
+    else:
+        rows = iter_filter_rows(catalog, spec)
+    for row in rows:
+        yield catalog[row]
+
+
+def filter_catalog(catalog: Iterable[Switch], args: argparse.Namespace) -> List[Switch]:
+    return list(iter_filter_catalog(catalog, args))
+
+
+# ---------- Facets ----------
+
+PORT_BUCKETS = (("0-8", None, 8), ("9-16", 9, 16), ("17-24", 17, 24), ("25-48", 25, 48), ("49+", 49, None))
+FACET_NAMES = ("vendor", "layer", "poe", "managed", "stackable", "ports-bucket")
+
+
+def parse_facets(text: str) -> Tuple[str, ...]:
+    """Parse a comma-separated ``--facets`` list, rejecting unknown or repeated names."""
+    names = tuple(name.strip() for name in text.split(",") if name.strip())
+    if not names:
+        raise ValueError("expected at least one facet name")
+    unknown = [name for name in names if name not in FACET_NAMES]
+    if unknown:
+        raise ValueError(f"unknown facet(s) {', '.join(unknown)}; choose from {', '.join(FACET_NAMES)}")
+    if len(set(names)) != len(names):
+        raise ValueError("facet names must not repeat")
+    return names
+
+
+def facet_counts(catalog: SwitchCatalog, mask: int, names: Sequence[str]) -> Dict[str, Dict[str, int]]:
+    """
+    Per-value counts of the rows in ``mask`` for each facet in ``names``.
+
+    Every count is one AND and popcount against a column bitmap or a range
+    index slice; no record is visited.
+    """
+    columns = catalog.columns
+    total = mask.bit_count()
+    counts: Dict[str, Dict[str, int]] = {}
+    for name in names:
+        if name in ("vendor", "layer"):
+            facet = getattr(columns, name).facet(mask)
+            counts[name] = dict(sorted(facet.items(), key=lambda item: (-item[1], item[0].lower())))
+        elif name in ("poe", "managed", "stackable"):
+            yes = (mask & getattr(columns, name)).bit_count()
+            counts[name] = {"yes": yes, "no": total - yes}
+        else:
+            counts[name] = {
+                label: (mask & columns.ports_index.mask(low, high)).bit_count() for label, low, high in PORT_BUCKETS
+            }
+    return counts
+
+
+def format_facets(total: int, counts: Dict[str, Dict[str, int]]) -> str:
+    lines = [f"Facets over {total} matching switches:"]
+    for name, values in counts.items():
+        lines.append(f"{name}:")
+        width = max((len(value) for value in values), default=0)
+        lines.extend(f"  {value:<{width}}  {count}" for value, count in values.items())
+    return "\n".join(lines)
+
+
+def write_facets(total: int, counts: Dict[str, Dict[str, int]], fp: TextIO, output: str = "table") -> None:
+    """Write facet counts as text, one JSON object (json/ndjson) or ``facet,value,count`` CSV."""
+    if output == "table":
+        print(format_facets(total, counts), file=fp)
+    elif output == "csv":
+        writer = csv.writer(fp, lineterminator="\n")
+        writer.writerow(["facet", "value", "count"])
+        writer.writerows((name, value, count) for name, values in counts.items() for value, count in values.items())
+    else:
+        payload = {"total": total, "facets": counts}
+        print(json.dumps(payload, indent=None if output == "ndjson" else 2), file=fp)
+
+
+def write_json_rows(
+    catalog: SwitchCatalog,
+    rows: Iterable[int],
+    fp: TextIO,
+    pretty: bool = True,
+    fields: Optional[Sequence[str]] = None,
+) -> None:
+    """Stream catalog rows as a JSON array by concatenating their cached fragments."""
+    _write_json_array(_row_fragments(catalog, rows, pretty, fields), fp, pretty)
+
+
+def write_ndjson_rows(
+    catalog: SwitchCatalog, rows: Iterable[int], fp: TextIO, fields: Optional[Sequence[str]] = None
+) -> None:
+    """Stream catalog rows as JSON Lines, one compact object per row."""
+    for fragment in _row_fragments(catalog, rows, False, fields):
+        fp.write(fragment)
+        fp.write("\n")
+
+
+def write_csv_rows(
+    catalog: SwitchCatalog, rows: Iterable[int], fp: TextIO, fields: Optional[Sequence[str]] = None
+) -> None:
+    """
+    Stream catalog rows as CSV with a header line.
+
+    Booleans are written as ``true``/``false``, a missing PoE budget as an
+    empty cell, and ``cli_sections``/``troubleshooting`` as compact JSON.
+    """
+    fields = fields or _SWITCH_FIELDS
+    readers = [catalog.field_reader(name) for name in fields]
+    writer = csv.writer(fp, lineterminator="\n")
+    writer.writerow(fields)
+    for row in rows:
+        writer.writerow([_csv_cell(read(row)) for read in readers])
+
+
+def _row_fragments(
+    catalog: SwitchCatalog, rows: Iterable[int], pretty: bool, fields: Optional[Sequence[str]]
+) -> Iterator[str]:
+    if fields is None:
+        return (catalog.json_fragment(row, pretty) for row in rows)
+    # Projections only read the requested fields, so the heavy CLI blocks of a
+    # record are never serialized unless asked for.
+    readers = [(name, catalog.field_reader(name)) for name in fields]
+    return (_json_object({name: read(row) for name, read in readers}, pretty) for row in rows)
+
+
+def _csv_cell(value: object) -> object:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (str, int)):
+        return value
+    return json.dumps(value, separators=(",", ":"))
+
+
+def parse_fields(text: str) -> Tuple[str, ...]:
+    """Parse a comma-separated ``--fields`` list, rejecting unknown or repeated names."""
+    names = tuple(name.strip() for name in text.split(",") if name.strip())
+    if not names:
+        raise ValueError("expected at least one field name")
+    unknown = [name for name in names if name not in _SWITCH_FIELDS]
+    if unknown:
+        raise ValueError(f"unknown field(s) {', '.join(unknown)}; choose from {', '.join(_SWITCH_FIELDS)}")
+    if len(set(names)) != len(names):
+        raise ValueError("field names must not repeat")
+    return names
+
+
+def _write_json_array(fragments: Iterable[str], fp: TextIO, pretty: bool) -> None:
+    first, separator = ("\n  ", ",\n  ") if pretty else ("", ",")
+    fp.write("[")
+    empty = True
+    for fragment in fragments:
+        fp.write(first if empty else separator)
+        fp.write(fragment)
+        empty = False
+    fp.write("\n]" if pretty and not empty else "]")
+
+
+TABLE_HEADERS = [
+    "Vendor",
+    "Model",
+    "Ports",
+    "PoE",
+    "Layer",
+    "Managed",
+    "Stackable",
+    "Uplinks",
+    "PoE Budget (W)",
+    "Notes",
+]
+NO_MATCHES = "No switches matched your criteria."
+
+
+def _table_row(sw: Switch) -> List[str]:
+    return [
+        sw.vendor,
+        sw.model,
+        str(sw.ports),
+        "Yes" if sw.poe else "No",
+        sw.layer,
+        "Yes" if sw.managed else "No",
+        "Yes" if sw.stackable else "No",
+        f"{sw.uplink_count} @ {sw.uplink}",
+        str(sw.poe_budget) if sw.poe_budget is not None else "-",
+        sw.notes,
+    ]
+
+
+# Rendered text per pooled CLI/troubleshooting block, keyed by block identity.
+# Each entry keeps its block alive, so an id can never be reused while cached.
+# The cache is a bounded LRU so long-running processes do not keep the blocks
+# of every catalog they ever loaded (see ``BlockPool``).
+RENDERED_BLOCKS_MAX = 4096
+_RENDERED_BLOCKS: "OrderedDict[Tuple[str, int], Tuple[object, object]]" = OrderedDict()
+_RENDERED_BLOCKS_LOCK = threading.Lock()
+
+
+def _rendered(kind: str, block: object, render: Callable[[], object]):
+    key = (kind, id(block))
+    with _RENDERED_BLOCKS_LOCK:
+        entry = _RENDERED_BLOCKS.get(key)
+        if entry is not None and entry[0] is block:
+            _RENDERED_BLOCKS.move_to_end(key)
+            return entry[1]
+    text = render()
+    with _RENDERED_BLOCKS_LOCK:
+        _RENDERED_BLOCKS[key] = (block, text)
+        _RENDERED_BLOCKS.move_to_end(key)
+        if len(_RENDERED_BLOCKS) > RENDERED_BLOCKS_MAX:
+            _RENDERED_BLOCKS.popitem(last=False)
+    return text
+
+
+def _section_lines(cli_sections: Dict[str, Tuple[str, ...]]) -> Tuple[str, ...]:
+    def render() -> Tuple[str, ...]:
+        lines: List[str] = []
+        for section, commands in cli_sections.items():
+            lines.append(f"  {section}:")
+            lines.extend(f"    {cmd}" for cmd in commands)
+        return tuple(lines)
+
+    return _rendered("sections", cli_sections, render)
+
+
+def _troubleshooting_lines(troubleshooting: Tuple[str, ...]) -> Tuple[str, ...]:
+    def render() -> Tuple[str, ...]:
+        if not troubleshooting:
+            return ()
+        return ("  Troubleshooting:",) + tuple(f"    {cmd}" for cmd in troubleshooting)
+
+    return _rendered("troubleshooting", troubleshooting, render)
+
+
+def _cli_lines(sw: Switch) -> List[str]:
+    lines: List[str] = [f"[{sw.vendor} {sw.model}]"]
+    lines.extend(_section_lines(sw.cli_sections))
+    lines.extend(_troubleshooting_lines(sw.troubleshooting))
+    lines.append("")
+    return lines
+
+
+class SnippetAppendix:
+    """
+    Shared-snippets rendering for one output.
+
+    Each distinct configuration (``C<n>``) or troubleshooting (``T<n>``)
+    block is listed once in an appendix; switches reference it by ID.
+    """
+
+    def __init__(self) -> None:
+        self._ids: Dict[int, str] = {}
+        self._counts = {"C": 0, "T": 0}
+        self._blocks: List[Tuple[str, Tuple[str, ...]]] = []
+
+    def _reference(self, prefix: str, block: object, lines: Tuple[str, ...]) -> str:
+        ident = self._ids.get(id(block))
+        if ident is None:
+            self._counts[prefix] += 1
+            ident = self._ids[id(block)] = f"{prefix}{self._counts[prefix]}"
+            self._blocks.append((ident, lines))
+        return ident
+
+    def switch_lines(self, sw: Switch) -> List[str]:
+        lines = [f"[{sw.vendor} {sw.model}]"]
+        if sw.cli_sections:
+            ident = self._reference("C", sw.cli_sections, _section_lines(sw.cli_sections))
+            lines.append(f"  Configuration: see snippet {ident}")
+        if sw.troubleshooting:
+            ident = self._reference("T", sw.troubleshooting, _troubleshooting_lines(sw.troubleshooting))
+            lines.append(f"  Troubleshooting: see snippet {ident}")
+        lines.append("")
+        return lines
+
+    def lines(self) -> List[str]:
+        if not self._blocks:
+            return []
+        lines = ["Shared snippets:"]
+        for ident, block_lines in self._blocks:
+            lines.append(f"[{ident}]")
+            lines.extend(block_lines)
+            lines.append("")
+        return lines
+
+
+def format_table(
+    items: Iterable[Switch], include_cli: bool, group_by_vendor: bool, shared_snippets: bool = False
+) -> str:
+    items = list(items)
+    if not items:
+        return NO_MATCHES
+
+    headers = TABLE_HEADERS
+
+    def render_rows(rows: List[List[str]]) -> List[str]:
+        col_widths = [max(len(row[i]) for row in rows + [headers]) for i in range(len(headers))]
+
+        def render_row(row: List[str]) -> str:
+            return " | ".join(cell.ljust(col_widths[i]) for i, cell in enumerate(row))
+
+        lines = [render_row(headers), "-+-".join("-" * w for w in col_widths)]
+        lines.extend(render_row(row) for row in rows)
+        return lines
+
+    appendix = SnippetAppendix() if shared_snippets else None
+
+    def render_cli(sw: Switch) -> List[str]:
+        if not include_cli:
+            return []
+        if appendix is not None:
+            return appendix.switch_lines(sw)
+        return _cli_lines(sw)
+
+    lines: List[str] = []
+    if group_by_vendor:
+        # One pass buckets rows per vendor (vendor strings are interned, so
+        # hashing them is cheap); buckets keep the original row order.
+        groups: Dict[str, List[Switch]] = {}
+        for sw in items:
+            groups.setdefault(sw.vendor, []).append(sw)
+        for vendor in sorted(groups):
+            subset = groups[vendor]
+            lines.append(f"== {vendor} ==")
+            rows = [_table_row(sw) for sw in subset]
+            lines.extend(render_rows(rows))
+            if include_cli:
+                lines.append("Configuration snippets:")
+                for sw in subset:
+                    lines.extend(render_cli(sw))
+    else:
+        rows = [_table_row(sw) for sw in items]
+        lines.extend(render_rows(rows))
+        if include_cli:
+            lines.append("Configuration snippets:")
+            for sw in items:
+                lines.extend(render_cli(sw))
+    if appendix is not None:
+        lines.extend(appendix.lines())
+
+    return "\n".join(lines).rstrip()
+
+
+def write_table_stream(
+    items: Iterable[Switch],
+    fp: TextIO,
+    include_cli: bool,
+    sample_rows: int = 200,
+    max_col_width: Optional[int] = None,
+    shared_snippets: bool = False,
+) -> None:
+    """
+    Write the results table row by row instead of building one string.
+
+    Column widths come from the first ``sample_rows`` rows (later, wider cells
+    overflow their column) and are capped at ``max_col_width`` when given,
+    in which case longer cells are truncated with "...". CLI snippets are
+    spooled to a temporary file while rows stream and appended after the
+    table, so memory stays flat either way. ``shared_snippets`` works as in
+    ``format_table``.
+    """
+    items = iter(items)
+    sample = list(itertools.islice(items, max(1, sample_rows)))
+    if not sample:
+        fp.write(NO_MATCHES + "\n")
+        return
+
+    sample_rows_text = [_table_row(sw) for sw in sample] + [TABLE_HEADERS]
+    widths = [max(len(row[i]) for row in sample_rows_text) for i in range(len(TABLE_HEADERS))]
+    if max_col_width is not None:
+        widths = [min(width, max(3, max_col_width)) for width in widths]
+
+    def fit(cell: str, width: int) -> str:
+        if max_col_width is not None and len(cell) > width:
+            return cell[: width - 3] + "..."
+        return cell.ljust(width)
+
+    def write_row(row: List[str]) -> None:
+        fp.write(" | ".join(fit(cell, widths[i]) for i, cell in enumerate(row)) + "\n")
+
+    write_row(TABLE_HEADERS)
+    fp.write("-+-".join("-" * w for w in widths) + "\n")
+    appendix = SnippetAppendix() if shared_snippets else None
+    with tempfile.TemporaryFile("w+", encoding="utf-8") as snippets:
+        for sw in itertools.chain(sample, items):
+            write_row(_table_row(sw))
+            if include_cli:
+                cli_lines = appendix.switch_lines(sw) if appendix is not None else _cli_lines(sw)
+                snippets.write("\n".join(cli_lines) + "\n")
+        if include_cli:
+            fp.write("Configuration snippets:\n")
+            snippets.seek(0)
+            shutil.copyfileobj(snippets, fp)
+    if appendix is not None:
+        for line in appendix.lines():
+            fp.write(line + "\n")
+
+
+def _preview(commands: Tuple[str, ...]) -> str:
+    def render() -> str:
+        preview = "; ".join(commands[:4])
+        if len(commands) > 4:
+            preview += " ..."
+        return preview
+
+    return _rendered("preview", commands, render)
+
+
+def _section_previews(cli_sections: Dict[str, Tuple[str, ...]]) -> Tuple[str, ...]:
+    return _rendered(
+        "section-previews",
+        cli_sections,
+        lambda: tuple(f"  - {section}: {_preview(cmds)}" for section, cmds in cli_sections.items()),
+    )
+
+
+def answer_question(question: str, catalog: Iterable[Switch], top: int = 1) -> str:
+    """
+    Lightweight, rule-based assistant to suggest switches and commands.
+
+    This is intentionally simple (no external AI/LLM calls). It scores switches by
+    matching vendor/model keywords and then crafts a short recommendation plus
+    next steps. With ``top`` > 1 the next best switches are listed as alternatives.
+    Equal scores are ranked by catalog order.
+    """
+
+    q_low = question.lower()
+
+    def score_switch(sw: Switch) -> int:
+        score = 0
+        if sw.vendor.lower() in q_low:
+            score += 3
+        if sw.model.lower() in q_low:
+            score += 3
+        if "poe" in q_low and sw.poe:
+            score += 2
+        if "stack" in q_low and sw.stackable:
+            score += 2
+        if "layer 3" in q_low or "l3" in q_low:
+            score += 1 if sw.layer.lower() == "l3" else 0
+        if "troubleshoot" in q_low or "diagnose" in q_low:
+            score += 1 if sw.troubleshooting else 0
+        if "uplink" in q_low:
+            score += 1
+        return score
+
+    # Bounded heap: O(n log k) instead of sorting every scored switch.
+    ranked = heapq.nlargest(
+        max(1, top),
+        ((score_switch(sw), -row, sw) for row, sw in enumerate(catalog)),
+        key=lambda entry: entry[:2],
+    )
+    if not ranked or ranked[0][0] == 0:
+        return (
+            "I didn't find a specific match. Try mentioning a vendor or feature "
+            "(e.g., 'Cisco PoE 48-port stackable L3 with troubleshooting commands')."
+        )
+    best = ranked[0][2]
+
+    lines = [
+        (
+            f"Suggested match: {best.vendor} {best.model} ({best.layer}, {best.ports} ports, "
+            f"{'PoE' if best.poe else 'non-PoE'}, "
+            f"{'stackable' if best.stackable else 'non-stackable'})."
+        ),
+        (
+            f"Uplinks: {best.uplink_count} @ {best.uplink}. PoE budget: "
+            f"{best.poe_budget if best.poe_budget is not None else 'N/A'}."
+        ),
+        f"Notes: {best.notes}",
+    ]
+
+    if best.cli_sections:
+        lines.append("Key configuration sections:")
+        lines.extend(_section_previews(best.cli_sections))
+
+    if best.troubleshooting:
+        lines.append(f"Troubleshooting tips: {_preview(best.troubleshooting)}")
+
+    alternatives = [sw for score, _, sw in ranked[1:] if score > 0]
+    if alternatives:
+        lines.append("Alternatives:")
+        lines.extend(
+            f"  {rank}. {sw.vendor} {sw.model} ({sw.layer}, {sw.ports} ports, "
+            f"{'PoE' if sw.poe else 'non-PoE'}, {'stackable' if sw.stackable else 'non-stackable'})"
+            for rank, sw in enumerate(alternatives, start=2)
+        )
+
+    lines.append("You can see full details with:")
+    lines.append(
+        f'  python app.py --vendor "{best.vendor}" --model "{best.model}" --include-cli --group-by-vendor'
+    )
+
+    return "\n".join(lines)
+
+
+# ---------- Batch queries ----------
+
+# A batch is JSON Lines: one object per query using the CLI's option names
+# (``{"vendor": "Cisco", "min_ports": 24, "poe": "yes", "limit": 5,
+# "fields": ["model"], "id": "row-17"}``). Answers come back as JSON Lines in
+# request order, each with its match count and timing.
+
+_QUERY_TEXT_KEYS = ("vendor", "model", "keyword", "layer")
+_QUERY_INT_KEYS = ("min_ports", "max_ports", "min_poe_budget", "max_poe_budget", "min_uplinks", "limit")
+_QUERY_SELECTOR_KEYS = ("poe", "managed", "stackable")
+_QUERY_KEYS = frozenset(_QUERY_TEXT_KEYS + _QUERY_INT_KEYS + _QUERY_SELECTOR_KEYS + ("fields",))
+_SELECTOR_VALUES = {"yes": "yes", "true": "yes", "no": "no", "false": "no"}
+
+
+def parse_filter_query(item: Dict[str, object]) -> Tuple[FilterSpec, Optional[int], Optional[Tuple[str, ...]]]:
+    """
+    Validate a filter query into ``(spec, limit, fields)``, raising ``ValueError`` with the reason.
+
+    Shared by batch entries (decoded JSON) and the HTTP API's ``/switches``
+    parameters (strings), so both accept the same values: integers or their
+    decimal text, selectors as yes/no/true/false or JSON booleans, and
+    ``fields`` as a list of names or a comma-separated string.
+    """
+    unknown = set(item) - _QUERY_KEYS
+    if unknown:
+        raise ValueError(f"unknown key(s): {', '.join(sorted(unknown))}")
+
+    values: Dict[str, object] = {}
+    for key in _QUERY_TEXT_KEYS:
+        value = item.get(key)
+        if value is not None and not isinstance(value, str):
+            raise ValueError(f"'{key}' must be a string")
+        values[key] = value
+    for key in _QUERY_INT_KEYS:
+        value = item.get(key)
+        if isinstance(value, str):
+            with contextlib.suppress(ValueError):
+                value = int(value)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, int)):
+            raise ValueError(f"'{key}' must be an integer")
+        values[key] = value
+    for key in _QUERY_SELECTOR_KEYS:
+        value = item.get(key)
+        if isinstance(value, bool):
+            value = "yes" if value else "no"
+        elif isinstance(value, str):
+            value = _SELECTOR_VALUES.get(value.lower(), value)
+        if value is not None and value not in ("yes", "no"):
+            raise ValueError(f"'{key}' must be yes, no, true or false")
+        values[key] = value
+
+    fields = item.get("fields")
+    if isinstance(fields, list) and all(isinstance(name, str) for name in fields):
+        fields = ",".join(fields)
+    if fields is not None and not isinstance(fields, str):
+        raise ValueError("'fields' must be a list of names or a comma-separated string")
+    try:
+        projection = None if fields is None else parse_fields(fields)
+    except ValueError as exc:
+        raise ValueError(f"'fields': {exc}") from None
+
+    limit = values.pop("limit")
+    spec = FilterSpec.from_args(argparse.Namespace(**values))
+    return spec, None if limit is None else max(0, limit), projection  # type: ignore[call-overload]
+
+
+@dataclass(frozen=True)
+class BatchQuery:
+    """One parsed batch entry: its filter, output options and the caller's ``id``."""
+
+    spec: FilterSpec
+    limit: Optional[int] = None
+    fields: Optional[Tuple[str, ...]] = None
+    id: object = None
+
+
+def parse_batch_query(item: object) -> BatchQuery:
+    """Validate one decoded batch entry (see ``parse_filter_query``), raising ``ValueError`` with the reason."""
+    if not isinstance(item, dict):
+        raise ValueError("expected a JSON object")
+    query = dict(item)
+    ident = query.pop("id", None)
+    spec, limit, fields = parse_filter_query(query)
+    return BatchQuery(spec=spec, limit=limit, fields=fields, id=ident)
+
+
+def read_batch(lines: Iterable[str]) -> List[object]:
+    """Parse batch lines into ``BatchQuery`` objects, or ``ValueError`` for bad lines."""
+    queries: List[object] = []
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            queries.append(parse_batch_query(json.loads(line)))
+        except ValueError as exc:
+            queries.append(ValueError(f"line {number}: {exc}"))
+    return queries
+
+
+def _timed_select(catalog: SwitchCatalog, spec: FilterSpec) -> Tuple[int, float]:
+    started = time.perf_counter()
+    mask = QUERY_CACHE.select(catalog, spec)
+    return mask, (time.perf_counter() - started) * 1000
+
+
+async def stream_batch(
+    catalog: SwitchCatalog, queries: Sequence[object], fp: TextIO, concurrency: Optional[int] = None
+) -> None:
+    """
+    Answer ``queries`` (see ``read_batch``) as JSON Lines on ``fp``, in request order.
+
+    Identical filters are evaluated once and their row mask shared by every
+    query using them. Distinct filters run on a thread pool, up to
+    ``concurrency`` at a time, in a bounded window ahead of the writer, so
+    answers stream out as soon as the queries before them are done.
+    """
+    concurrency = concurrency or min(32, os.cpu_count() or 4)
+    loop = asyncio.get_running_loop()
+    remaining = Counter(query.spec for query in queries if isinstance(query, BatchQuery))
+    evaluations: Dict[FilterSpec, asyncio.Future] = {}
+    window: Deque[Tuple[int, object, Optional[asyncio.Future], bool]] = deque()
+    pending = enumerate(queries)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+
+        def schedule(index: int, query: object) -> None:
+            future, shared = None, False
+            if isinstance(query, BatchQuery):
+                future = evaluations.get(query.spec)
+                shared = future is not None
+                if future is None:
+                    future = evaluations[query.spec] = loop.run_in_executor(
+                        executor, _timed_select, catalog, query.spec
+                    )
+            window.append((index, query, future, shared))
+
+        for index, query in itertools.islice(pending, concurrency * 4):
+            schedule(index, query)
+        while window:
+            index, query, future, shared = window.popleft()
+            upcoming = next(pending, None)
+            if upcoming is not None:
+                schedule(*upcoming)
+
+            if future is None:
+                fp.write(json.dumps({"index": index, "error": str(query)}, separators=(",", ":")))
+                fp.write("\n")
+                continue
+            assert isinstance(query, BatchQuery)
+            mask, elapsed_ms = await future
+            remaining[query.spec] -= 1
+            if not remaining[query.spec]:
+                del evaluations[query.spec]  # no later query needs this mask
+
+            header = {
+                "index": index,
+                "id": query.id,
+                "count": mask.bit_count(),
+                "eval_ms": round(elapsed_ms, 3),
+                "shared": shared,
+            }
+            rows: Iterable[int] = _iter_mask(mask, len(catalog))
+            if query.limit is not None:
+                rows = itertools.islice(rows, query.limit)
+            fp.write(json.dumps(header, separators=(",", ":"))[:-1])
+            fp.write(',"results":')
+            _write_json_array(_row_fragments(catalog, rows, False, query.fields), fp, pretty=False)
+            fp.write("}\n")
+
+
+def write_batch(
+    catalog: SwitchCatalog, lines: Iterable[str], fp: TextIO, concurrency: Optional[int] = None
+) -> None:
+    """Synchronous wrapper around ``stream_batch`` for batch lines from a file or request body."""
+    asyncio.run(stream_batch(catalog, read_batch(lines), fp, concurrency))
+
+
+# ---------- Query daemon ----------
+
+# ``app.py serve`` keeps catalogs, indexes, snapshots and the query cache warm
+# in one process and answers command lines sent over a Unix domain socket, so
+# a query costs a socket round-trip instead of a fresh interpreter.
+#
+# Protocol: the client sends one JSON line ``{"argv": [...], "cwd": "..."}``;
+# the daemon answers with frames of ``<1-byte channel><u32 length><payload>``.
+# Channel ``o``/``e`` carries stdout/stderr bytes as they are produced, and a
+# final ``x`` frame carries the exit status in its length field.
+
+_FRAME = struct.Struct(">cI")
+_FRAME_FLUSH_BYTES = 64 * 1024
+
+
+def default_socket_path() -> str:
+    """Daemon socket (``SWITCH_CATALOG_SOCKET`` overrides; else the runtime or cache dir)."""
+    override = os.environ.get("SWITCH_CATALOG_SOCKET")
+    if override:
+        return override
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime:
+        return str(Path(runtime) / "switch-catalog.sock")
+    return str(snapshot_dir() / "daemon.sock")
+
+
+class _FrameWriter(io.TextIOBase):
+    """Text stream sending its output to the client as frames of one channel."""
+
+    def __init__(self, sock: socket.socket, channel: bytes) -> None:
+        self._sock = sock
+        self._channel = channel
+        self._pending: List[bytes] = []
+        self._pending_size = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        data = text.encode("utf-8")
+        self._pending.append(data)
+        self._pending_size += len(data)
+        if self._pending_size >= _FRAME_FLUSH_BYTES:
+            self.flush()
+        return len(text)
+
+    def flush(self) -> None:
+        if self._pending_size:
+            payload = b"".join(self._pending)
+            self._pending.clear()
+            self._pending_size = 0
+            self._sock.sendall(_FRAME.pack(self._channel, len(payload)) + payload)
+
+
+class _RequestError(Exception):
+    def __init__(self, status: int) -> None:
+        super().__init__(status)
+        self.status = status
+
+
+class _RequestParser(argparse.ArgumentParser):
+    """Parser reporting to one request's streams and raising instead of exiting the daemon."""
+
+    out: TextIO = sys.stdout
+    err: TextIO = sys.stderr
+
+    def _print_message(self, message: str, file: Optional[TextIO] = None) -> None:
+        if message:
+            (self.err if file is sys.stderr else self.out).write(message)
+
+    def exit(self, status: int = 0, message: Optional[str] = None):  # type: ignore[override]
+        if message:
+            self.err.write(message)
+        raise _RequestError(status)
+
+
+class _CatalogPool:
+    """Catalogs loaded by the daemon, reloaded when their file changes on disk."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()  # guards ``_key_locks``
+        self._key_locks: Dict[Tuple[Optional[str], bool], threading.Lock] = {}
+        self._loaded: Dict[Tuple[Optional[str], bool], Tuple[Optional[Tuple[int, int]], SwitchCatalog]] = {}
+
+    def get(self, path: Optional[str], use_cache: bool) -> SwitchCatalog:
+        """
+        The catalog at ``path``, loaded on first use or when the file changed.
+
+        Loads hold only their own catalog's lock: queries against other
+        catalogs keep being answered while a large file is parsed.
+        """
+        stamp = None
+        if path:
+            stat = os.stat(path)
+            stamp = (stat.st_size, stat.st_mtime_ns)
+        key = (path or None, use_cache)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            loaded = self._loaded.get(key)
+            if loaded is None or loaded[0] != stamp:
+                loaded = self._loaded[key] = (stamp, load_catalog(path, use_cache=use_cache))
+            return loaded[1]
+
+
+class _QueryHandler(socketserver.StreamRequestHandler):
+    server: "QueryDaemon"
+
+    def handle(self) -> None:
+        line = self.rfile.readline()
+        if not line:
+            return  # a liveness probe, or a client that gave up
+        out = _FrameWriter(self.connection, b"o")
+        err = _FrameWriter(self.connection, b"e")
+        try:
+            status = self._answer(json.loads(line), out, err)
+        except Exception as exc:  # report instead of killing the connection silently
+            err.write(f"error: {exc}\n")
+            status = 1
+        try:
+            out.flush()
+            err.flush()
+            self.connection.sendall(_FRAME.pack(b"x", status))
+        except OSError:
+            pass  # the client went away; nothing left to tell it
+
+    def _answer(self, request: Dict[str, object], out: _FrameWriter, err: _FrameWriter) -> int:
+        parser = build_parser(_RequestParser)
+        parser.prog = "app.py"
+        parser.out, parser.err = out, err  # type: ignore[attr-defined]
+        try:
+            args = parse_args(request["argv"], parser)  # type: ignore[arg-type]
+        except _RequestError as exc:
+            return exc.status
+        cwd = str(request.get("cwd") or "")
+        stdin = None
+        if args.batch == "-":
+            if not isinstance(request.get("stdin"), str):
+                err.write("error: --batch - needs the client's stdin in the request.\n")
+                return 2
+            stdin = io.StringIO(request["stdin"])  # type: ignore[arg-type]
+        elif args.batch:
+            args.batch = os.path.join(cwd, args.batch)
+        catalog_path = args.catalog and os.path.join(cwd, args.catalog)
+        try:
+            catalog = self.server.catalogs.get(catalog_path, use_cache=not args.no_cache)
+        except (OSError, ValueError) as exc:
+            err.write(f"error: cannot load catalog {args.catalog}: {exc}\n")
+            return 1
+        run(args, catalog, out, err, stdin)
+        return 0
+
+
+class QueryDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Unix-socket server answering ``app.py`` command lines from warm catalogs."""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str) -> None:
+        self.catalogs = _CatalogPool()
+        super().__init__(socket_path, _QueryHandler)
+
+
+def query_daemon(socket_path: str, argv: Sequence[str], stdin: Optional[str] = None) -> Optional[int]:
+    """
+    Forward ``argv`` (and ``stdin`` for ``--batch -``) to the daemon on ``socket_path`` and relay its output.
+
+    Returns the exit status, or ``None`` when no daemon is listening.
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except OSError:
+        sock.close()
+        return None
+    streams = {b"o": sys.stdout.buffer, b"e": sys.stderr.buffer}
+    with sock, sock.makefile("rb") as replies:
+        request: Dict[str, object] = {"argv": list(argv), "cwd": os.getcwd()}
+        if stdin is not None:
+            request["stdin"] = stdin
+        sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        while True:
+            header = replies.read(_FRAME.size)
+            if len(header) < _FRAME.size:
+                print("error: the query daemon closed the connection mid-answer.", file=sys.stderr)
+                return 1
+            channel, length = _FRAME.unpack(header)
+            if channel == b"x":
+                sys.stdout.flush()
+                return length
+            streams[channel].write(replies.read(length))
+            if channel == b"e":
+                sys.stderr.flush()
+
+
+def parse_serve_args(argv: Sequence[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="app.py serve",
+        description="Keep catalogs warm and answer 'app.py --server' queries over a Unix socket.",
+    )
+    parser.add_argument(
+        "--socket",
+        help=(
+            "Socket path to listen on (default: $SWITCH_CATALOG_SOCKET, else switch-catalog.sock in "
+            "$XDG_RUNTIME_DIR, else daemon.sock in the snapshot cache directory)."
+        ),
+    )
+    parser.add_argument(
+        "--catalog",
+        action="append",
+        default=[],
+        help="Catalog to load before accepting queries (repeatable); others load on first use.",
+    )
+    args = parser.parse_args(argv)
+    args.socket = args.socket or default_socket_path()
+    return args
+
+
+def serve(args: argparse.Namespace) -> int:
+    """Run the query daemon until interrupted."""
+    socket_path = args.socket
+    if query_daemon_alive(socket_path):
+        print(f"error: a query daemon is already listening on {socket_path}", file=sys.stderr)
+        return 1
+    Path(socket_path).parent.mkdir(parents=True, exist_ok=True)
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(socket_path)  # left behind by a daemon that did not shut down cleanly
+
+    previous_umask = os.umask(0o077)  # only the owning user may send queries
+    try:
+        server = QueryDaemon(socket_path)
+    finally:
+        os.umask(previous_umask)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.catalogs.get(None, use_cache=True)
+        for path in args.catalog:
+            server.catalogs.get(os.path.abspath(path), use_cache=True)
+        print(f"Serving switch catalog queries on {socket_path}", file=sys.stderr)
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(socket_path)
+    return 0
+
+
+def query_daemon_alive(socket_path: str) -> bool:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_path)
+        except OSError:
+            return False
+    return True
+
+
+def build_parser(parser_class: type = argparse.ArgumentParser) -> argparse.ArgumentParser:
+    parser = parser_class(
+        description="Search and explore switch models with example CLI configurations.",
+        epilog="Run 'app.py serve --help' for the query daemon.",
+    )
+    parser.add_argument(
+        "--catalog",
+        help=(
+            "Path to a JSON catalog (list of switches) or a JSON Lines catalog (.jsonl, one switch "
+            "per line) to use instead of the built-in sample."
+        ),
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Parse --catalog directly without reading or writing its compiled snapshot.",
+    )
+    parser.add_argument("--vendor", help="Exact vendor match (e.g., Cisco, Juniper).")
+    parser.add_argument("--model", help="Substring match on the model name.")
+    parser.add_argument(
+        "--keyword",
+        help="Keyword to search across vendor, model, uplink, and notes (case-insensitive).",
+    )
+    parser.add_argument("--layer", choices=["L2", "L3"], help="Layer capability filter.")
+    parser.add_argument("--min-ports", type=int, help="Minimum copper port count.")
+    parser.add_argument("--max-ports", type=int, help="Maximum copper port count.")
+    parser.add_argument(
+        "--min-poe-budget",
+        type=int,
+        help="Minimum PoE power budget in watts (switches without a known budget are excluded).",
+    )
+    parser.add_argument(
+        "--max-poe-budget",
+        type=int,
+        help="Maximum PoE power budget in watts (switches without a known budget are excluded).",
+    )
+    parser.add_argument("--min-uplinks", type=int, help="Minimum number of uplink ports.")
+    parser.add_argument(
+        "--poe",
+        choices=["yes", "no"],
+        help="Filter by Power-over-Ethernet support.",
+    )
+    parser.add_argument(
+        "--managed",
+        choices=["yes", "no"],
+        help="Filter by managed vs unmanaged.",
+    )
+    parser.add_argument(
+        "--stackable",
+        choices=["yes", "no"],
+        help="Filter by stackable capability.",
+    )
+    parser.add_argument(
+        "--output",
+        choices=["table", "json", "ndjson", "csv"],
+        default="table",
+        help="Choose output format. ndjson and csv write one line per switch as results are found.",
+    )
+    parser.add_argument(
+        "--fields",
+        help=(
+            "Comma-separated switch fields to output with --output json/ndjson/csv "
+            f"(default: all). Available: {', '.join(_SWITCH_FIELDS)}."
+        ),
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="With --output json, print the array without indentation.",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Write table rows as they are found instead of after the whole result is ready.",
+    )
+    parser.add_argument(
+        "--sample-rows",
+        type=int,
+        default=200,
+        help="With --stream, size columns from this many leading rows (default: 200).",
+    )
+    parser.add_argument(
+        "--max-col-width",
+        type=int,
+        help="With --stream, cap every column at this width and truncate longer cells.",
+    )
+    parser.add_argument(
+        "--include-cli",
+        action="store_true",
+        help="Include sample CLI configuration snippets in the output.",
+    )
+    parser.add_argument(
+        "--shared-snippets",
+        action="store_true",
+        help=(
+            "With --include-cli, print each distinct configuration/troubleshooting block once in a "
+            "'Shared snippets' appendix and reference it by ID from every switch."
+        ),
+    )
+    parser.add_argument(
+        "--group-by-vendor",
+        action="store_true",
+        help="Group results by vendor with per-vendor tables and command sections.",
+    )
+    parser.add_argument(
+        "--ask",
+        help="Ask a natural-language question (e.g., 'PoE 48-port Cisco with troubleshooting commands').",
+    )
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=3,
+        help="With --ask, list this many suggestions: the best match plus alternatives (default: 3).",
+    )
+    parser.add_argument(
+        "--limit",
+        type=int,
+        help="Limit the number of results shown (after filtering).",
+    )
+    parser.add_argument(
+        "--explain",
+        action="store_true",
+        help="Print the chosen filter plan with estimated vs actual row counts (to stderr).",
+    )
+    parser.add_argument(
+        "--footprint",
+        action="store_true",
+        help="Report the in-memory size of the loaded catalog records and exit.",
+    )
+    parser.add_argument(
+        "--facets",
+        help=(
+            "Instead of listing matches, print per-value match counts for these comma-separated "
+            f"facets ({', '.join(FACET_NAMES)}); honours --output json/ndjson/csv."
+        ),
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help=(
+            "Processes for per-row filter checks on a cached (snapshot-backed) catalog "
+            f"(default: all CPUs for catalogs of {SHARD_AUTO_MIN_ROWS:,}+ switches without --limit, else 1)."
+        ),
+    )
+    parser.add_argument(
+        "--batch",
+        metavar="QUERIES",
+        help=(
+            "Answer a JSON Lines file of queries ('-' for stdin), one object per line using these "
+            "option names (plus 'limit', 'fields' and an echoed 'id'); prints one JSON line per "
+            "query, in order, with its count and timing. Filter options on the command line are ignored."
+        ),
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        help="With --batch, evaluate at most this many distinct filters at once (default: CPU count).",
+    )
+    parser.add_argument(
+        "--server",
+        nargs="?",
+        const="",
+        metavar="SOCKET",
+        help=(
+            "Send the query to a running 'app.py serve' daemon (default socket when no path is "
+            "given) and print its answer; runs locally when no daemon is listening."
+        ),
+    )
+    return parser
+
+
+def parse_args(
+    argv: Optional[Sequence[str]] = None, parser: Optional[argparse.ArgumentParser] = None
+) -> argparse.Namespace:
+    parser = parser or build_parser()
+    args = parser.parse_args(argv)
+    if args.fields is not None:
+        if args.output == "table":
+            parser.error("--fields applies to --output json, ndjson and csv.")
+        try:
+            args.fields = parse_fields(args.fields)
+        except ValueError as exc:
+            parser.error(f"--fields: {exc}")
+    if args.facets is not None:
+        try:
+            args.facets = parse_facets(args.facets)
+        except ValueError as exc:
+            parser.error(f"--facets: {exc}")
+    if args.stream and args.group_by_vendor:
+        parser.error("--stream writes one table; it cannot be combined with --group-by-vendor.")
+    return args
+
+
+def run(
+    args: argparse.Namespace, catalog: SwitchCatalog, out: TextIO, err: TextIO, stdin: Optional[TextIO] = None
+) -> None:
+    """Answer one parsed command line against ``catalog`` (``stdin`` feeds ``--batch -``)."""
+    if args.batch:
+        if args.batch == "-":
+            write_batch(catalog, stdin or sys.stdin, out, args.concurrency)
+        else:
+            with open(args.batch, encoding="utf-8") as handle:
+                write_batch(catalog, handle, out, args.concurrency)
+        return
+
+    if args.footprint:
+        print(format_footprint(catalog_footprint(catalog)), file=out)
+        return
+
+    if args.ask:
+        print(answer_question(args.ask, catalog, top=args.top), file=out)
+        return
+
+    if args.explain:
+        spec = FilterSpec.from_args(args)
+        if spec.keyword:
+            catalog.keyword_index  # load it so the keyword estimate comes from posting sizes
+        print(QueryPlan(catalog, spec).explain(), file=err)
+
+    if args.facets:
+        mask = QUERY_CACHE.select(catalog, FilterSpec.from_args(args), args.workers)
+        write_facets(mask.bit_count(), facet_counts(catalog, mask, args.facets), out, args.output)
+        return
+
+    # A --limit is answered lazily (stopping early) unless --workers asks for a sharded scan.
+    workers = args.workers if args.limit is None else args.workers or 1
+    rows: Iterable[int] = iter_filter_rows(catalog, FilterSpec.from_args(args), workers)
+    if args.limit is not None:
+        rows = itertools.islice(rows, max(0, args.limit))
+
+    if args.output == "json":
+        write_json_rows(catalog, rows, out, pretty=not args.compact, fields=args.fields)
+        print(file=out)
+        return
+    if args.output == "ndjson":
+        write_ndjson_rows(catalog, rows, out, fields=args.fields)
+        return
+    if args.output == "csv":
+        write_csv_rows(catalog, rows, out, fields=args.fields)
+        return
+
+    matches = map(catalog.__getitem__, rows)
+    if args.stream:
+        write_table_stream(
+            matches,
+            out,
+            include_cli=args.include_cli,
+            sample_rows=args.sample_rows,
+            max_col_width=args.max_col_width,
+            shared_snippets=args.shared_snippets,
+        )
+    else:
+        print(
+            format_table(
+                matches,
+                include_cli=args.include_cli,
+                group_by_vendor=args.group_by_vendor,
+                shared_snippets=args.shared_snippets,
+            ),
+            file=out,
+        )
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv[:1] == ["serve"]:
+        return serve(parse_serve_args(argv[1:]))
+
+    args = parse_args(argv)
+    stdin = None
+    if args.server is not None:
+        # The daemon cannot read this process's stdin, so a piped batch travels in the request.
+        batch = sys.stdin.read() if args.batch == "-" else None
+        status = query_daemon(args.server or default_socket_path(), argv, batch)
+        if status is not None:
+            return status
+        print("note: no query daemon is listening; answering locally.", file=sys.stderr)
+        stdin = None if batch is None else io.StringIO(batch)
+
+    run(args, load_catalog(args.catalog, use_cache=not args.no_cache), sys.stdout, sys.stderr, stdin)
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        sys.exit(main())
+    except BrokenPipeError:
+        # Streamed output piped into e.g. `head` that exited early: stop quietly.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
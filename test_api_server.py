@@ -0,0 +1,128 @@
+"""
+Tests for the HTTP JSON API: status codes, revalidation, gzip and the response cache.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import http.client
+import json
+import threading
+from urllib.parse import quote
+
+import pytest
+
+import api_server
+import app
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = api_server.CatalogAPIServer(("127.0.0.1", 0), app.load_catalog(None))
+    server.precompute_common()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def get(server, path: str, **headers: str):
+    connection = http.client.HTTPConnection(*server.server_address[:2], timeout=10)
+    try:
+        connection.request("GET", path, headers=headers)
+        response = connection.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+    finally:
+        connection.close()
+
+
+def test_etag_is_derived_from_the_catalog_contents(tmp_path):
+    assert app.load_catalog(None).version == app.load_catalog(None).version
+    assert not app.load_catalog(None).version.startswith("memory-")
+    source = tmp_path / "switches.json"
+    source.write_text(json.dumps([sw.to_dict() for sw in app.default_catalog()]), encoding="utf-8")
+    expected = hashlib.sha256(source.read_bytes()).hexdigest()
+    assert app.load_catalog(str(source), use_cache=False).version == expected
+
+
+def test_revalidation_answers_304_only_for_valid_requests(server):
+    status, headers, body = get(server, "/switches?vendor=Cisco")
+    assert status == 200 and json.loads(body)
+    etag = headers["ETag"]
+    assert etag == f'W/"{server.catalog.version}"'
+
+    status, headers, body = get(server, "/switches?vendor=Cisco", **{"If-None-Match": etag})
+    assert (status, body, headers["ETag"]) == (304, b"", etag)
+    assert get(server, "/switches?poe=maybe", **{"If-None-Match": etag})[0] == 400
+    assert get(server, "/switches?min_ports=many", **{"If-None-Match": etag})[0] == 400
+    assert get(server, "/switches/NO-SUCH-MODEL", **{"If-None-Match": etag})[0] == 404
+    assert get(server, "/nowhere", **{"If-None-Match": "*"})[0] == 404
+
+
+def test_errors_carry_a_message(server):
+    status, _, body = get(server, "/switches?colour=blue")
+    assert status == 400 and "colour" in json.loads(body)["error"]
+    status, _, body = get(server, "/ask")
+    assert status == 400 and "'q'" in json.loads(body)["error"]
+
+
+def test_model_lookup_is_case_insensitive(server):
+    model = server.catalog[0].model
+    status, _, body = get(server, f"/switches/{quote(model.lower())}")
+    assert status == 200 and json.loads(body)["model"] == model
+
+
+def test_gzip_body_matches_plain_body(server):
+    status, plain_headers, plain = get(server, "/switches")
+    assert status == 200 and "Content-Encoding" not in plain_headers
+    status, headers, body = get(server, "/switches", **{"Accept-Encoding": "gzip"})
+    assert headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(body) == plain
+    _, headers, _ = get(server, "/switches", **{"Accept-Encoding": "gzip;q=0"})
+    assert "Content-Encoding" not in headers
+
+
+@pytest.mark.parametrize(
+    "query, item",
+    [
+        ("poe=true&managed=No", {"poe": True, "managed": "no"}),
+        ("min_ports=24&limit=5", {"min_ports": 24, "limit": 5}),
+        ("vendor=Cisco&fields=model,ports", {"vendor": "Cisco", "fields": ["model", "ports"]}),
+    ],
+)
+def test_query_parameters_parse_like_batch_entries(query, item):
+    batch = app.parse_batch_query(item)
+    assert api_server.parse_switch_query(query) == (batch.spec, batch.limit, batch.fields)
+    for bad in ("poe=maybe", "min_ports=x", "colour=blue", "fields=colour"):
+        with pytest.raises(api_server.BadRequest):
+            api_server.parse_switch_query(bad)
+
+
+def test_response_cache_counts_every_byte():
+    cache = api_server.ResponseCache(max_bytes=40_000)
+    for number in range(20):
+        cache.put(("entry", number), api_server.EncodedResponse(b"x" * 4000))
+        assert cache.total_bytes <= cache.max_bytes
+    assert cache.get(("entry", 0)) is None and cache.get(("entry", 19)) is not None
+
+    response = cache.get(("entry", 19))
+    response.gzipped()  # growing a full cache evicts the oldest entry
+    assert cache.total_bytes == sum(entry.size for entry in cache._entries.values()) <= cache.max_bytes
+    assert cache.get(("entry", 19)) is response and cache._sizes[("entry", 19)] == 4000 + len(response.gzipped())
+
+    cache.put(("huge",), api_server.EncodedResponse(b"x" * 20_000))
+    assert cache.get(("huge",)) is None
+
+
+def test_response_cache_pins_use_at_most_half():
+    cache = api_server.ResponseCache(max_bytes=40_000)
+    for number in range(8):
+        cache.put(("pinned", number), api_server.EncodedResponse(b"p" * 6000), pin=True)
+    for number in range(20):
+        cache.put(("entry", number), api_server.EncodedResponse(b"x" * 4000))
+    assert cache._pinned_bytes <= cache.max_bytes // 2
+    assert cache.total_bytes <= cache.max_bytes
+    assert all(cache.get(("pinned", number)) is not None for number in range(3))
+    assert cache.get(("entry", 19)) is not None
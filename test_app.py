@@ -0,0 +1,694 @@
+"""
+Equivalence tests for the catalog filter engine and the streaming JSON reader.
+
+The bitmask, index, snapshot and query-cache paths must select exactly the
+rows the original row-by-row filter selected; ``reference_filter`` restates
+those semantics (plus the newer budget/uplink bounds) over plain records.
+"""
+
+from __future__ import annotations
+
+import csv
+import hashlib
+import io
+import itertools
+import json
+import random
+import re
+import threading
+from collections import Counter
+from types import SimpleNamespace
+from typing import List
+
+import pytest
+
+import app
+
+VENDOR_BLOCKS = {
+    "Cisco": (app.CISCO_CLI, ["show interfaces status", "show power inline", "show vlan brief"]),
+    "Juniper": (app.JUNIPER_CLI, ["show interfaces terse", "show poe interface all"]),
+    "Aruba": (app.ARUBA_CX_CLI, ["show interface brief", "show power-over-ethernet"]),
+    "Netgear": (app.NETGEAR_SMART_CLI, ["show interfaces status all"]),
+    "Ubiquiti": (app.UNIFI_CLI, []),
+    "TP-Link": (app.UNMANAGED_CLI, []),
+}
+NOTES = ["Campus access switch.", "Core/distribution (L3).", "Branch office, PoE+ phones", "Lab | test bench", ""]
+
+# Enough rows that index lookups, dense postings and row-check thresholds all come into play.
+CATALOG_ROWS = 3000
+
+
+def generate_records(rows: int, seed: int = 11) -> List[dict]:
+    rng = random.Random(seed)
+    records = []
+    for row in range(rows):
+        vendor = rng.choice(list(VENDOR_BLOCKS))
+        cli, troubleshooting = VENDOR_BLOCKS[vendor]
+        ports = rng.choice([5, 8, 16, 24, 48, 52])
+        poe = rng.random() < 0.6
+        records.append(
+            {
+                "vendor": vendor,
+                "model": f"{rng.choice(['C93', 'EX', 'CX 6', 'M43', 'GS'])}{ports}{'P' if poe else 'T'}-{row}",
+                "ports": ports,
+                "poe": poe,
+                "layer": rng.choice(["L2", "L3"]),
+                "managed": vendor != "TP-Link",
+                "stackable": rng.random() < 0.5,
+                "uplink": rng.choice(["4x10G", "2xSFP+", "N/A"]),
+                "uplink_count": rng.choice([0, 2, 4]),
+                "poe_budget": rng.choice([None, 0, 120, 370, 740]) if poe else None,
+                "cli_sections": cli,
+                "troubleshooting": troubleshooting,
+                "notes": rng.choice(NOTES),
+            }
+        )
+    return records
+
+
+def reference_filter(records: List[app.Switch], args: SimpleNamespace) -> List[app.Switch]:
+    """The original row-by-row filter, extended with the budget and uplink bounds."""
+
+    def bool_filter(value: bool, selector) -> bool:
+        if selector is None or selector.lower() not in ("yes", "no"):
+            return True
+        return value if selector.lower() == "yes" else not value
+
+    results = []
+    for item in records:
+        if args.vendor and item.vendor.lower() != args.vendor.lower():
+            continue
+        if args.model and args.model.lower() not in item.model.lower():
+            continue
+        if args.keyword and args.keyword.lower() not in item.search_text():
+            continue
+        if args.min_ports and item.ports < args.min_ports:
+            continue
+        if args.max_ports and item.ports > args.max_ports:
+            continue
+        if args.layer and item.layer.lower() != args.layer.lower():
+            continue
+        if not (bool_filter(item.poe, args.poe) and bool_filter(item.managed, args.managed)):
+            continue
+        if not bool_filter(item.stackable, args.stackable):
+            continue
+        budget = item.poe_budget
+        if args.min_poe_budget is not None and (budget is None or budget < args.min_poe_budget):
+            continue
+        if args.max_poe_budget is not None and (budget is None or budget > args.max_poe_budget):
+            continue
+        if args.min_uplinks is not None and item.uplink_count < args.min_uplinks:
+            continue
+        results.append(item)
+    return results
+
+
+KEYWORDS = [
+    None, "campus", "Campus access", "show power", "SHOW", "vlan 10", "l3", "(l3)", "|", " ", "t", "-", "e e",
+    "po", "interfaces status", "switchport mode", "xyz", "ge-0/0/1",
+]
+MODELS = [None, "ex", "C93", "24p", "cx 6", "-1", "2", "zzz", "t-29"]
+
+
+def random_args(rng: random.Random) -> SimpleNamespace:
+    return SimpleNamespace(
+        vendor=rng.choice([None, "cisco", "Juniper", "ARUBA", "tp-link", "nope"]),
+        model=rng.choice(MODELS),
+        keyword=rng.choice(KEYWORDS),
+        layer=rng.choice([None, "L2", "l3"]),
+        min_ports=rng.choice([None, 0, 16, 24]),
+        max_ports=rng.choice([None, 0, 24, 48]),
+        min_poe_budget=rng.choice([None, None, 0, 300]),
+        max_poe_budget=rng.choice([None, None, 400]),
+        min_uplinks=rng.choice([None, None, 2]),
+        poe=rng.choice([None, "yes", "no", "YES", "maybe"]),
+        managed=rng.choice([None, "yes", "no"]),
+        stackable=rng.choice([None, "yes", "no"]),
+    )
+
+
+def filter_args(**values) -> SimpleNamespace:
+    """Filter arguments with nothing set except ``values``."""
+    args = SimpleNamespace(**{name: None for name in vars(random_args(random.Random(0)))})
+    vars(args).update(values)
+    return args
+
+
+def models(items) -> List[str]:
+    return [sw.model for sw in items]
+
+
+@pytest.fixture(scope="module")
+def catalog_file(tmp_path_factory):
+    path = tmp_path_factory.mktemp("catalog") / "switches.json"
+    path.write_text(json.dumps(generate_records(CATALOG_ROWS)), encoding="utf-8")
+    return path
+
+
+@pytest.fixture(scope="module")
+def reference_records(catalog_file):
+    return list(app.iter_catalog(catalog_file))
+
+
+@pytest.fixture
+def snapshot_catalog(catalog_file, tmp_path, monkeypatch):
+    monkeypatch.setenv("SWITCH_CATALOG_CACHE_DIR", str(tmp_path / "cache"))
+    app.load_catalog(str(catalog_file))  # compiles the snapshot
+    catalog = app.load_catalog(str(catalog_file))
+    assert catalog._snapshot is not None
+    return catalog
+
+
+def test_cold_catalog_matches_reference(catalog_file, reference_records):
+    catalog = app.load_catalog(str(catalog_file), use_cache=False)
+    rng = random.Random(1)
+    for _ in range(200):
+        args = random_args(rng)
+        assert models(app.filter_catalog(catalog, args)) == models(reference_filter(reference_records, args)), args
+
+
+def test_plain_record_list_matches_reference(reference_records):
+    rng = random.Random(2)
+    for _ in range(50):
+        args = random_args(rng)
+        assert models(app.filter_catalog(reference_records, args)) == models(reference_filter(reference_records, args))
+
+
+def test_snapshot_catalog_matches_reference(snapshot_catalog, reference_records):
+    rng = random.Random(3)
+    for _ in range(200):
+        args = random_args(rng)
+        assert models(app.filter_catalog(snapshot_catalog, args)) == models(reference_filter(reference_records, args))
+
+
+def test_snapshot_records_round_trip(snapshot_catalog, reference_records):
+    assert list(snapshot_catalog) == reference_records
+
+
+def test_query_cache_narrowing_matches_reference(snapshot_catalog, reference_records):
+    cache = app.QUERY_CACHE
+    cache.clear()
+    rng = random.Random(4)
+    for _ in range(100):
+        args = random_args(rng)
+        spec = app.FilterSpec.from_args(args)
+        # Cache a broader query first (keyword/model prefixes, looser or dropped
+        # bounds) so the narrower one is refined from it instead of planned cold.
+        broader = app.FilterSpec(
+            vendor=spec.vendor,
+            model=spec.model[:1] if spec.model else None,
+            keyword=spec.keyword[:2] if spec.keyword else None,
+            min_ports=spec.min_ports - 8 if spec.min_ports else None,
+            max_ports=spec.max_ports + 8 if spec.max_ports else None,
+            poe=spec.poe,
+        )
+        assert spec.narrows(broader)
+        cache.select(snapshot_catalog, broader)
+        assert cache._broader((snapshot_catalog.version, spec)) is not None
+        rows = list(cache.iter_rows(snapshot_catalog, spec))
+        expected = models(reference_filter(reference_records, args))
+        assert [snapshot_catalog[row].model for row in rows] == expected, args
+        mask = cache.select(snapshot_catalog, spec)
+        assert [snapshot_catalog[row].model for row in app._iter_mask(mask, len(snapshot_catalog))] == expected
+    cache.clear()
+
+
+def test_narrows_is_sound(reference_records):
+    rng = random.Random(5)
+    checked = 0
+    for _ in range(3000):
+        narrow, broad = random_args(rng), random_args(rng)
+        if app.FilterSpec.from_args(narrow).narrows(app.FilterSpec.from_args(broad)):
+            checked += 1
+            broad_rows = set(models(reference_filter(reference_records, broad)))
+            assert set(models(reference_filter(reference_records, narrow))) <= broad_rows, (narrow, broad)
+    assert checked
+
+
+@pytest.mark.parametrize("distinct", [1, 12, 5000])
+def test_range_index_masks_match_a_scan(distinct):
+    rng = random.Random(distinct)
+    values = [rng.randrange(distinct) for _ in range(4000)]
+    indexed = [row for row in range(len(values)) if row % 5]
+    index = app.RangeIndex(values, indexed)
+    bounds = [None, -1, 0, 1, distinct // 2, distinct - 1, distinct, distinct * 2]
+    for low in bounds:
+        for high in bounds:
+            rows = [
+                row
+                for row in indexed
+                if (low is None or values[row] >= low) and (high is None or values[row] <= high)
+            ]
+            assert index.mask(low, high) == app._mask_from_rows(rows, len(values)), (low, high)
+            assert index.count(low, high) == len(rows)
+    assert len(index.prefix_masks) <= app.RANGE_PREFIX_MASKS + 1
+
+
+def test_sharded_refinement_matches_serial(snapshot_catalog):
+    spec = app.FilterSpec(model="c", keyword="show power")
+    serial = app.select_rows(snapshot_catalog, spec, workers=1)
+    assert serial
+    sharded = app.select_sharded(snapshot_catalog, spec, snapshot_catalog.columns.all_rows, workers=2)
+    assert sharded == serial
+
+
+def test_replaced_shard_pool_outlives_its_running_queries(snapshot_catalog):
+    spec = app.FilterSpec(model="c", keyword="show power")
+    serial = app.select_rows(snapshot_catalog, spec, workers=1)
+    all_rows = snapshot_catalog.columns.all_rows
+    with app._shard_pool(snapshot_catalog, 1) as executor:
+        # A query wanting more workers replaces the pool while this one still uses it.
+        assert app.select_sharded(snapshot_catalog, spec, all_rows, workers=2) == serial
+        assert executor.submit(app._refine_shard, spec, all_rows).result() == serial
+    with pytest.raises(RuntimeError):
+        executor.submit(app._refine_shard, spec, all_rows)
+
+
+def test_explain_uses_keyword_statistics_when_index_loaded(snapshot_catalog):
+    spec = app.FilterSpec(keyword="campus")
+    assert app.QueryPlan(snapshot_catalog, spec).steps[0].guessed
+    snapshot_catalog.keyword_index
+    step = app.QueryPlan(snapshot_catalog, spec).steps[0]
+    assert not step.guessed
+    assert step.selectivity * len(snapshot_catalog) >= app.select_rows(snapshot_catalog, spec, workers=1).bit_count()
+
+
+# ---------- Snapshots ----------
+
+
+def _corrupt_section(path, section: str) -> None:
+    snapshot = app.CatalogSnapshot.map(path)
+    offset, _ = snapshot.header["sections"][section]
+    snapshot.close()
+    data = bytearray(path.read_bytes())
+    data[offset : offset + 32] = b"\x95" + b"\xff" * 31
+    path.write_bytes(bytes(data))
+
+
+@pytest.mark.parametrize("section", ["columns", "keyword_index", "model_postings"])
+def test_corrupt_snapshot_section_never_fails_the_load(catalog_file, reference_records, tmp_path, monkeypatch, section):
+    monkeypatch.setenv("SWITCH_CATALOG_CACHE_DIR", str(tmp_path / "cache"))
+    args = filter_args(keyword="campus", model="c93")
+    app.load_catalog(str(catalog_file))
+    warm = app.load_catalog(str(catalog_file))
+    warm.keyword_index, warm.model_index  # building them stores them in the snapshot
+    _corrupt_section(app.CatalogSnapshot.location(catalog_file), section)
+    catalog = app.load_catalog(str(catalog_file))
+    assert models(app.filter_catalog(catalog, args)) == models(reference_filter(reference_records, args))
+
+
+def test_snapshot_stores_indexes_on_first_use(catalog_file, reference_records, tmp_path, monkeypatch):
+    monkeypatch.setenv("SWITCH_CATALOG_CACHE_DIR", str(tmp_path / "cache"))
+    location = app.CatalogSnapshot.location(catalog_file)
+    app.load_catalog(str(catalog_file))
+    assert not {"keyword_index", "model_postings"} & set(app.CatalogSnapshot.map(location).header["sections"])
+    warm = app.load_catalog(str(catalog_file))
+    warm.keyword_index, warm.model_index
+    assert {"keyword_index", "model_postings"} <= set(app.CatalogSnapshot.map(location).header["sections"])
+    catalog = app.load_catalog(str(catalog_file))
+    assert catalog.keyword_index.size == len(reference_records)
+    args = filter_args(keyword="campus", model="c93")
+    assert models(app.filter_catalog(catalog, args)) == models(reference_filter(reference_records, args))
+
+
+def test_file_replaced_while_parsing_is_not_snapshotted(tmp_path, monkeypatch):
+    monkeypatch.setenv("SWITCH_CATALOG_CACHE_DIR", str(tmp_path / "cache"))
+    source = tmp_path / "switches.json"
+    old = json.dumps(generate_records(50, seed=1)).encode("utf-8")
+    source.write_bytes(old)
+    parse = app._iter_records
+
+    def replacing_parse(handle, json_lines):
+        for number, item in enumerate(parse(handle, json_lines)):
+            if number == 0:
+                replacement = tmp_path / "replacement.json"
+                replacement.write_text(json.dumps(generate_records(60, seed=2)), encoding="utf-8")
+                replacement.replace(source)
+            yield item
+
+    monkeypatch.setattr(app, "_iter_records", replacing_parse)
+    catalog = app.load_catalog(str(source))
+    assert len(catalog) == 50
+    assert catalog.version == hashlib.sha256(old).hexdigest()
+    assert not app.CatalogSnapshot.location(source).exists()
+    monkeypatch.setattr(app, "_iter_records", parse)
+    assert len(app.load_catalog(str(source))) == 60
+    reloaded = app.load_catalog(str(source))
+    assert reloaded._snapshot is not None and len(reloaded) == 60
+
+
+# ---------- Output ----------
+
+
+def render(catalog: app.SwitchCatalog, fields=None, pretty: bool = False) -> list:
+    buffer = io.StringIO()
+    app.write_json_rows(catalog, range(len(catalog)), buffer, pretty=pretty, fields=fields)
+    return json.loads(buffer.getvalue())
+
+
+def test_limit_stops_row_checks_early(reference_records, monkeypatch):
+    catalog = app.SwitchCatalog(reference_records[::-1])  # contents no query has cached yet
+    args = filter_args(keyword="show power")  # a phrase: index candidates still need row checks
+    matching = models(reference_filter(list(catalog), args))
+    checked: List[str] = []
+    matches_keyword = app.Switch.matches_keyword
+
+    def counting(sw, keyword):
+        checked.append(sw.model)
+        return matches_keyword(sw, keyword)
+
+    monkeypatch.setattr(app.Switch, "matches_keyword", counting)
+    assert models(itertools.islice(app.iter_filter_catalog(catalog, args), 3)) == matching[:3]
+    assert 0 < len(checked) < len(matching) // 10
+
+
+def test_cli_limit_prints_the_first_matches(catalog_file, reference_records, capsys):
+    assert app.main(["--catalog", str(catalog_file), "--no-cache", "--poe", "yes", "--limit", "4", "--output", "ndjson"]) == 0
+    printed = [json.loads(line)["model"] for line in capsys.readouterr().out.splitlines()]
+    assert printed == models(reference_filter(reference_records, filter_args(poe="yes")))[:4]
+
+
+@pytest.mark.parametrize("include_cli", [False, True])
+@pytest.mark.parametrize("shared_snippets", [False, True])
+def test_streamed_table_matches_format_table(include_cli, shared_snippets):
+    items = list(app.default_catalog())
+    buffer = io.StringIO()
+    app.write_table_stream(items, buffer, include_cli, sample_rows=len(items), shared_snippets=shared_snippets)
+    assert buffer.getvalue().rstrip() == app.format_table(items, include_cli, False, shared_snippets)
+
+
+def test_streamed_table_widths_come_from_the_sample(reference_records):
+    buffer = io.StringIO()
+    app.write_table_stream(iter(reference_records[:50]), buffer, include_cli=False, sample_rows=5, max_col_width=12)
+    lines = buffer.getvalue().splitlines()
+    assert len(lines) == 2 + 50
+    assert len({len(line) for line in lines}) == 1  # capped cells are truncated, never overflow
+    assert all(len(cell.strip()) <= 12 for line in lines[2:] for cell in line.split(" | "))
+    empty = io.StringIO()
+    app.write_table_stream(iter([]), empty, include_cli=True)
+    assert empty.getvalue() == app.NO_MATCHES + "\n"
+
+
+def test_shared_snippets_list_each_block_once(reference_records):
+    items = reference_records[:200]
+    text = app.format_table(items, include_cli=True, group_by_vendor=False, shared_snippets=True)
+    table, appendix = text.split("Shared snippets:")
+    listed = re.findall(r"^\[([CT]\d+)\]$", appendix, re.MULTILINE)
+    referenced = set(re.findall(r"see snippet ([CT]\d+)$", table, re.MULTILINE))
+    assert len(listed) == len(set(listed)) and set(listed) == referenced
+    blocks = {json.dumps(sw.cli_sections) for sw in items if sw.cli_sections}
+    assert len([ident for ident in listed if ident.startswith("C")]) == len(blocks)
+
+
+def test_rendered_blocks_are_cached_per_block(reference_records):
+    first, second = [sw for sw in reference_records if sw.vendor == "Cisco"][:2]
+    assert first.cli_sections is second.cli_sections  # pooled at load
+    assert app._section_lines(first.cli_sections) is app._section_lines(second.cli_sections)
+    question = "Cisco PoE stackable with troubleshooting"
+    assert app.answer_question(question, reference_records) == app.answer_question(question, reference_records)
+
+
+def dump_json(records: List[app.Switch], pretty: bool) -> str:
+    items = [sw.to_dict() for sw in records]
+    return json.dumps(items, indent=2) if pretty else json.dumps(items, separators=(",", ":"))
+
+
+@pytest.mark.parametrize("pretty", [True, False])
+def test_json_output_matches_json_dumps(catalog_file, snapshot_catalog, pretty):
+    cold = app.load_catalog(str(catalog_file), use_cache=False)
+    for catalog in (cold, snapshot_catalog):
+        rows = range(0, len(catalog), 7)
+        buffer = io.StringIO()
+        app.write_json_rows(catalog, rows, buffer, pretty=pretty)
+        assert buffer.getvalue() == dump_json([cold[row] for row in rows], pretty)
+
+
+def test_json_fragments_escape_like_json_dumps():
+    record = generate_records(1)[0]
+    record.update(notes='caf\u00e9 "quoted" \\ tab\t', poe_budget=60.5, uplink="\u2603")
+    catalog = app.SwitchCatalog([app._switch_from_dict(record)])
+    for pretty in (True, False):
+        buffer = io.StringIO()
+        app.write_json_rows(catalog, [0], buffer, pretty=pretty)
+        assert buffer.getvalue() == dump_json(list(catalog), pretty)
+        empty = io.StringIO()
+        app.write_json_rows(catalog, [], empty, pretty=pretty)
+        assert empty.getvalue() == "[]"
+
+
+def test_ndjson_and_csv_rows(snapshot_catalog):
+    rows = list(range(0, len(snapshot_catalog), 11))
+    buffer = io.StringIO()
+    app.write_ndjson_rows(snapshot_catalog, rows, buffer)
+    assert [json.loads(line) for line in buffer.getvalue().splitlines()] == json.loads(dump_json([snapshot_catalog[row] for row in rows], False))
+
+    buffer = io.StringIO()
+    app.write_ndjson_rows(snapshot_catalog, rows, buffer, fields=("model", "ports"))
+    assert buffer.getvalue().splitlines()[0] == json.dumps(
+        {"model": snapshot_catalog[rows[0]].model, "ports": snapshot_catalog[rows[0]].ports}, separators=(",", ":")
+    )
+
+    buffer = io.StringIO()
+    app.write_csv_rows(snapshot_catalog, rows, buffer, fields=("model", "poe", "poe_budget", "troubleshooting"))
+    table = list(csv.reader(io.StringIO(buffer.getvalue())))
+    assert table[0] == ["model", "poe", "poe_budget", "troubleshooting"]
+    for row, cells in zip(rows, table[1:]):
+        sw = snapshot_catalog[row]
+        budget = "" if sw.poe_budget is None else str(sw.poe_budget)
+        assert cells == [sw.model, "true" if sw.poe else "false", budget, json.dumps(list(sw.troubleshooting), separators=(",", ":"))]
+    assert len(table) == len(rows) + 1
+
+
+def test_fields_are_validated(capsys):
+    assert app.parse_fields(" model , ports ") == ("model", "ports")
+    for text in ("", "model,model", "model,colour"):
+        with pytest.raises(ValueError):
+            app.parse_fields(text)
+    with pytest.raises(SystemExit):
+        app.parse_args(["--output", "csv", "--fields", "colour"])
+    assert "--fields" in capsys.readouterr().err
+
+
+def test_poe_budget_is_kept_as_given(tmp_path, monkeypatch):
+    monkeypatch.setenv("SWITCH_CATALOG_CACHE_DIR", str(tmp_path / "cache"))
+    budgets = [370, 370.7, "120", "n/a", None]
+    records = generate_records(len(budgets))
+    for record, budget in zip(records, budgets):
+        record["poe_budget"] = budget
+    source = tmp_path / "switches.json"
+    source.write_text(json.dumps(records), encoding="utf-8")
+    for _ in range(2):  # compiled, then from the snapshot
+        catalog = app.load_catalog(str(source))
+        assert [item["poe_budget"] for item in render(catalog)] == budgets
+        assert [item["poe_budget"] for item in render(catalog, fields=("model", "poe_budget"))] == budgets
+    assert models(app.filter_catalog(catalog, filter_args(min_poe_budget=300))) == [records[0]["model"], records[1]["model"]]
+
+
+# ---------- Facets ----------
+
+
+def reference_facets(records: List[app.Switch]) -> dict:
+    def bucket(ports: int) -> str:
+        return next(label for label, low, high in app.PORT_BUCKETS if (low or 0) <= ports <= (high or ports))
+
+    def yes_no(name: str) -> dict:
+        yes = sum(getattr(sw, name) for sw in records)
+        return {"yes": yes, "no": len(records) - yes}
+
+    buckets = Counter(bucket(sw.ports) for sw in records)
+    return {
+        "vendor": dict(Counter(sw.vendor for sw in records)),
+        "layer": dict(Counter(sw.layer for sw in records)),
+        "poe": yes_no("poe"),
+        "managed": yes_no("managed"),
+        "stackable": yes_no("stackable"),
+        "ports-bucket": {label: buckets[label] for label, _, _ in app.PORT_BUCKETS},
+    }
+
+
+@pytest.mark.parametrize("args", [filter_args(), filter_args(poe="yes", min_ports=20), filter_args(keyword="campus")])
+def test_facet_counts_match_a_scan(snapshot_catalog, reference_records, args):
+    mask = app.select_rows(snapshot_catalog, app.FilterSpec.from_args(args))
+    counts = app.facet_counts(snapshot_catalog, mask, app.FACET_NAMES)
+    assert counts == reference_facets(reference_filter(reference_records, args))
+    vendor_counts = list(counts["vendor"].values())
+    assert vendor_counts == sorted(vendor_counts, reverse=True)
+
+
+def test_cli_facets_output(catalog_file, reference_records, capsys):
+    argv = ["--catalog", str(catalog_file), "--no-cache", "--layer", "L3", "--facets", "vendor,ports-bucket"]
+    assert app.main(argv + ["--output", "json"]) == 0
+    payload = json.loads(capsys.readouterr().out)
+    matching = reference_filter(reference_records, filter_args(layer="L3"))
+    expected = reference_facets(matching)
+    assert payload == {"total": len(matching), "facets": {name: expected[name] for name in ("vendor", "ports-bucket")}}
+    assert app.main(argv + ["--output", "csv"]) == 0
+    rows = list(csv.reader(io.StringIO(capsys.readouterr().out)))
+    assert rows[0] == ["facet", "value", "count"] and len(rows) == 1 + len(expected["vendor"]) + len(app.PORT_BUCKETS)
+    with pytest.raises(SystemExit):
+        app.parse_args(["--facets", "colour"])
+
+
+# ---------- Recommendations ----------
+
+
+def test_ask_ranks_ties_by_catalog_order():
+    records = [app._switch_from_dict(item) for item in generate_records(400, seed=3)]
+    question = "Cisco PoE stackable"
+    text = app.answer_question(question, records, top=4)
+    # Every Cisco PoE stackable switch scores 7; the first ones in catalog order win.
+    winners = [sw for sw in records if sw.vendor == "Cisco" and sw.poe and sw.stackable][:4]
+    assert text.startswith(f"Suggested match: Cisco {winners[0].model} ")
+    alternatives = re.findall(r"^  (\d+)\. Cisco (\S+) ", text, re.MULTILINE)
+    assert alternatives == [(str(rank), sw.model) for rank, sw in enumerate(winners[1:], start=2)]
+    assert text == app.answer_question(question, app.SwitchCatalog(records), top=4)
+    assert "Alternatives:" not in app.answer_question(question, records, top=1)
+
+
+def test_ask_without_a_match_suggests_rephrasing():
+    assert app.answer_question("hello", app.default_catalog(), top=3).startswith("I didn't find a specific match.")
+
+
+def test_cli_top_limits_the_alternatives(capsys):
+    assert app.main(["--ask", "Cisco PoE stackable", "--top", "2"]) == 0
+    out = capsys.readouterr().out
+    assert re.findall(r"^  (\d+)\. ", out, re.MULTILINE) == ["2"]
+
+
+# ---------- Batch queries ----------
+
+
+def run_batch(catalog, lines: List[str], concurrency=None) -> List[dict]:
+    buffer = io.StringIO()
+    app.write_batch(catalog, lines, buffer, concurrency)
+    return [json.loads(line) for line in buffer.getvalue().splitlines()]
+
+
+def test_batch_answers_in_request_order_and_shares_duplicates(snapshot_catalog, reference_records):
+    queries = [{"id": number, "vendor": vendor, "limit": 3} for number, vendor in enumerate(["Cisco", "Aruba"] * 40)]
+    answers = run_batch(snapshot_catalog, [json.dumps(query) for query in queries], concurrency=4)
+    assert [answer["index"] for answer in answers] == list(range(len(queries)))
+    assert [answer["id"] for answer in answers] == [query["id"] for query in queries]
+    assert [answer["shared"] for answer in answers[:2]] == [False, False]
+    assert all(answer["shared"] for answer in answers[2:])
+    for query, answer in zip(queries, answers):
+        expected = models(reference_filter(reference_records, filter_args(vendor=query["vendor"])))
+        assert answer["count"] == len(expected)
+        assert [item["model"] for item in answer["results"]] == expected[:3]
+
+
+def test_batch_reports_bad_lines_in_place(snapshot_catalog):
+    lines = [
+        '{"vendor": "Cisco", "limit": 0}',
+        "not json",
+        '{"colour": "blue"}',
+        "",
+        '{"min_ports": "many"}',
+        '{"poe": "maybe"}',
+        '{"poe": true, "min_ports": "24", "fields": ["model"], "limit": 1}',
+    ]
+    answers = run_batch(snapshot_catalog, lines)
+    assert [answer["index"] for answer in answers] == list(range(6))
+    assert answers[0]["results"] == [] and answers[0]["count"] > 0
+    assert answers[1]["error"].startswith("line 2:")
+    assert "colour" in answers[2]["error"]
+    assert "'min_ports'" in answers[3]["error"] and "line 5:" in answers[3]["error"]
+    assert "'poe'" in answers[4]["error"]
+    assert list(answers[5]["results"][0]) == ["model"]
+
+
+# ---------- Query daemon ----------
+
+
+@pytest.fixture
+def daemon(tmp_path_factory):
+    socket_path = str(tmp_path_factory.mktemp("sock") / "d.sock")
+    server = app.QueryDaemon(socket_path)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, socket_path
+    server.shutdown()
+    server.server_close()
+
+
+def test_daemon_answers_like_a_local_run(daemon, catalog_file, capfdbinary):
+    _, socket_path = daemon
+    argv = ["--catalog", str(catalog_file), "--vendor", "Cisco", "--output", "json", "--no-cache"]
+    assert app.query_daemon(socket_path, argv) == 0
+    remote = capfdbinary.readouterr().out
+    assert app.main(argv) == 0
+    assert remote == capfdbinary.readouterr().out and json.loads(remote)
+
+
+def test_daemon_reports_usage_errors(daemon, capfdbinary):
+    _, socket_path = daemon
+    assert app.query_daemon(socket_path, ["--poe", "maybe"]) == 2
+    assert b"--poe" in capfdbinary.readouterr().err
+
+
+def test_daemon_reads_piped_batches_from_the_request(daemon, capfdbinary):
+    _, socket_path = daemon
+    batch = '{"id": 1, "vendor": "Cisco", "limit": 1}\n'
+    assert app.query_daemon(socket_path, ["--batch", "-"], stdin=batch) == 0
+    answers = [json.loads(line) for line in capfdbinary.readouterr().out.splitlines()]
+    assert [answer["id"] for answer in answers] == [1]
+    assert app.query_daemon(socket_path, ["--batch", "-"]) == 2
+
+
+def test_query_daemon_without_daemon_returns_none(tmp_path):
+    assert app.query_daemon(str(tmp_path / "missing.sock"), ["--vendor", "Cisco"]) is None
+
+
+def test_catalog_pool_loads_one_catalog_at_a_time_per_path(monkeypatch):
+    started, release = threading.Event(), threading.Event()
+    loads: List[str] = []
+
+    def load_catalog(path, use_cache=True):
+        loads.append(path)
+        if path == "slow":
+            started.set()
+            release.wait(10)
+        return app.SwitchCatalog(app.default_catalog())
+
+    monkeypatch.setattr(app, "load_catalog", load_catalog)
+    monkeypatch.setattr(app.os, "stat", lambda path: SimpleNamespace(st_size=1, st_mtime_ns=1))
+    pool = app._CatalogPool()
+    slow = [threading.Thread(target=pool.get, args=("slow", True)) for _ in range(2)]
+    for thread in slow:
+        thread.start()
+    assert started.wait(10)
+    pool.get("fast", True)  # not blocked behind the slow load
+    release.set()
+    for thread in slow:
+        thread.join(10)
+    assert sorted(loads) == ["fast", "slow"]
+
+
+# ---------- Streaming JSON array reader ----------
+
+VALID_DOCUMENTS = [
+    "[]",
+    "  [ ]  ",
+    "[1]",
+    "[12345, -0, 6.5e10, 1E-3, true, false, null]",
+    '["a\\"],[", "\\u00e9t\\u00e9", "", "]"]',
+    '[{"a": [1, 2, {"b": "]}"}]}, [], {}]',
+    '\n[\n  {"vendor": "Cisco", "ports": 48},\n  {"vendor": "Juniper", "ports": 24}\n]\n',
+    "[" + ",".join(str(n) for n in range(200)) + "]",
+]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64])
+@pytest.mark.parametrize("document", VALID_DOCUMENTS, ids=range(len(VALID_DOCUMENTS)))
+def test_iter_json_array_matches_json_loads(document, chunk_size):
+    assert list(app._iter_json_array(io.StringIO(document), chunk_size)) == json.loads(document)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 64])
+@pytest.mark.parametrize(
+    "document",
+    ["", "{}", "[1 2]", "[1,]", "[1] x", "[1, 2", '["abc', "[{}"],
+)
+def test_iter_json_array_rejects_malformed(document, chunk_size):
+    with pytest.raises(ValueError):
+        list(app._iter_json_array(io.StringIO(document), chunk_size))
@@ -7,29 +7,155 @@ optional configuration snippets.
 
 from __future__ import annotations
 
+import dataclasses
+import hashlib
+import io
+import itertools
 import json
-import tempfile
-from dataclasses import asdict
+from dataclasses import dataclass
 from types import SimpleNamespace
-from typing import Iterable, List, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
 
 import streamlit as st
 
-from app import Switch, answer_question, filter_catalog, format_table, load_catalog
+from app import (
+    JSON_LINES_SUFFIXES,
+    QUERY_CACHE,
+    FilterSpec,
+    SwitchCatalog,
+    answer_question,
+    facet_counts,
+    format_table,
+    iter_rows_from,
+    load_catalog,
+    load_catalog_bytes,
+    write_json_rows,
+)
 
 
-def _load_uploaded_catalog(uploaded_file) -> Tuple[List[Switch], Optional[str]]:
-    """Load catalog from an uploaded JSON file, falling back to default on errors."""
+PAGE_SIZES = [25, 50, 100, 250]
+PAGE_COLUMNS = (
+    "vendor",
+    "model",
+    "ports",
+    "poe",
+    "layer",
+    "managed",
+    "stackable",
+    "uplink",
+    "uplink_count",
+    "poe_budget",
+    "notes",
+)
+
+# Parsed uploads are shared by every session; the oldest are dropped beyond this.
+UPLOAD_CACHE_ENTRIES = 4
+UPLOAD_CACHE_TTL = "2h"
+
+
+@st.cache_resource(show_spinner=False)
+def _default_catalog() -> SwitchCatalog:
+    return load_catalog(None)
+
+
+@st.cache_resource(max_entries=UPLOAD_CACHE_ENTRIES, ttl=UPLOAD_CACHE_TTL, show_spinner="Parsing catalog...")
+def _parse_uploaded_catalog(digest: str, _data: bytes, json_lines: bool) -> SwitchCatalog:
+    """Parse an upload once per distinct content (``digest``), straight from its bytes."""
+    return load_catalog_bytes(_data, json_lines=json_lines)
+
+
+def _upload_digest(uploaded_file) -> str:
+    """Content hash of an upload, computed once per upload rather than on every rerun."""
+    digests = st.session_state.setdefault("upload_digests", {})
+    file_id = getattr(uploaded_file, "file_id", None) or (uploaded_file.name, uploaded_file.size)
+    digest = digests.get(file_id)
+    if digest is None:
+        digest = digests[file_id] = hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+    return digest
+
+
+def _load_uploaded_catalog(uploaded_file) -> Tuple[SwitchCatalog, Optional[str]]:
+    """Load catalog from an uploaded JSON or JSON Lines file, falling back to default on errors."""
     if not uploaded_file:
-        return load_catalog(None), None
+        return _default_catalog(), None
 
     try:
-        with tempfile.NamedTemporaryFile(delete=False) as temp:
-            temp.write(uploaded_file.getvalue())
-            temp_path = temp.name
-        return load_catalog(temp_path), None
+        json_lines = uploaded_file.name.lower().endswith(JSON_LINES_SUFFIXES)
+        catalog = _parse_uploaded_catalog(_upload_digest(uploaded_file), uploaded_file.getvalue(), json_lines)
+        return catalog, None
     except Exception as exc:  # pragma: no cover - UI feedback path
-        return load_catalog(None), f"Failed to load uploaded catalog: {exc}"
+        return _default_catalog(), f"Failed to load uploaded catalog: {exc}"
+
+
+@dataclass(frozen=True)
+class CatalogIndex:
+    """Everything a rerun needs from one catalog version, built once and shared by all sessions."""
+
+    catalog: SwitchCatalog
+    vendors: List[str]
+    layers: List[str]
+
+    @classmethod
+    def build(cls, catalog: SwitchCatalog) -> "CatalogIndex":
+        columns = catalog.columns
+        # Touch the lazy search indexes now so no user's keystroke pays for them.
+        catalog.keyword_index, catalog.model_index
+        return cls(
+            catalog=catalog,
+            vendors=sorted(set(columns.vendor.values)),
+            layers=sorted({layer.upper() for layer in columns.layer.values}),
+        )
+
+
+@st.cache_resource(max_entries=UPLOAD_CACHE_ENTRIES + 1, show_spinner="Indexing catalog...")
+def _catalog_index(version: str, _catalog: SwitchCatalog) -> CatalogIndex:
+    """The shared index of catalog ``version`` (the catalog itself is not hashed)."""
+    return CatalogIndex.build(_catalog)
+
+
+def _spec_from_state() -> FilterSpec:
+    """The filter as the widgets hold it at the start of this rerun (defaults before first render)."""
+    state = st.session_state
+
+    def choice(key: str) -> Optional[str]:
+        value = state.get(key, "Any")
+        return None if value == "Any" else value
+
+    return FilterSpec.from_args(
+        SimpleNamespace(
+            vendor=choice("filter_vendor"),
+            model=state.get("filter_model") or None,
+            keyword=state.get("filter_keyword") or None,
+            layer=choice("filter_layer"),
+            min_ports=state.get("filter_min_ports") or None,
+            max_ports=state.get("filter_max_ports") or None,
+            min_poe_budget=state.get("filter_min_poe_budget") or None,
+            max_poe_budget=None,
+            min_uplinks=state.get("filter_min_uplinks") or None,
+            poe=choice("filter_poe"),
+            managed=choice("filter_managed"),
+            stackable=choice("filter_stackable"),
+        )
+    )
+
+
+def _option_counts(catalog: SwitchCatalog, spec: FilterSpec) -> Dict[str, Callable[[str], str]]:
+    """
+    Selectbox labels with match counts for each faceted filter.
+
+    Each facet is counted under every *other* current filter (its own choice
+    cleared), so an option shows how many switches selecting it would give.
+    The masks come from the shared query cache and the counts from bitmaps.
+    """
+    labels: Dict[str, Callable[[str], str]] = {}
+    for name in ("vendor", "layer", "poe", "managed", "stackable"):
+        mask = QUERY_CACHE.select(catalog, dataclasses.replace(spec, **{name: None}))
+        counts = {value.lower(): count for value, count in facet_counts(catalog, mask, [name])[name].items()}
+        total = mask.bit_count()
+        labels[name] = lambda option, counts=counts, total=total: (
+            f"{option} ({total if option == 'Any' else counts.get(option.lower(), 0)})"
+        )
+    return labels
 
 
 def _build_args(
@@ -39,6 +165,8 @@ def _build_args(
     layer: Optional[str],
     min_ports: Optional[int],
     max_ports: Optional[int],
+    min_poe_budget: Optional[int],
+    min_uplinks: Optional[int],
     poe: Optional[str],
     managed: Optional[str],
     stackable: Optional[str],
@@ -56,6 +184,9 @@ def _build_args(
         layer=layer,
         min_ports=min_ports or None,
         max_ports=max_ports or None,
+        min_poe_budget=min_poe_budget or None,
+        max_poe_budget=None,
+        min_uplinks=min_uplinks or None,
         poe=poe,
         managed=managed,
         stackable=stackable,
@@ -67,15 +198,59 @@ def _build_args(
     )
 
 
-def _display_results(matches: Iterable[Switch], args: SimpleNamespace) -> None:
-    matches_list = list(matches)
-    if args.limit is not None:
-        matches_list = matches_list[: max(0, args.limit)]
+def _page_rows(mask: int, size: int, total: int, page_size: int, query_key: Tuple) -> Tuple[List[int], int, int]:
+    """
+    Rows of the page the session is on, plus its number and the page count.
+
+    Paging is cursor based: the session keeps the first row of every page it
+    has visited, so moving a page only walks that page's rows of the result
+    mask, however deep it is.
+    """
+    state = st.session_state
+    if state.get("page_query") != query_key:
+        state.page_query = query_key
+        state.page_starts = [0]
+        state.page_next = None
+    starts: List[int] = state.page_starts
+    pages = max(1, -(-total // page_size))
+
+    previous_col, label_col, next_col = st.columns([1, 3, 1])
+    with previous_col:
+        if st.button("Previous page", disabled=len(starts) == 1):
+            starts.pop()
+    with next_col:
+        if st.button("Next page", disabled=len(starts) >= pages or state.page_next is None):
+            starts.append(state.page_next)
+
+    visible = max(0, min(page_size, total - (len(starts) - 1) * page_size))
+    window = list(itertools.islice(iter_rows_from(mask, size, starts[-1]), visible + 1))
+    state.page_next = window[visible] if len(window) > visible and len(starts) < pages else None
+    with label_col:
+        st.caption(f"Page {len(starts)} of {pages} ({total} matches)")
+    return window[:visible], len(starts), pages
+
+
+def _display_results(catalog: SwitchCatalog, spec: FilterSpec, args: SimpleNamespace, page_size: int) -> None:
+    mask = QUERY_CACHE.select(catalog, spec)
+    total = mask.bit_count() if args.limit is None else min(mask.bit_count(), max(0, args.limit))
+    query_key = (catalog.version, spec, args.limit, page_size)
+    rows, _, _ = _page_rows(mask, len(catalog), total, page_size, query_key)
 
     if args.output == "json":
-        st.json([asdict(sw) for sw in matches_list])
+        buffer = io.StringIO()
+        write_json_rows(catalog, rows, buffer, pretty=False)
+        st.json(buffer.getvalue())
+    elif args.include_cli or args.group_by_vendor:
+        matches = map(catalog.__getitem__, rows)
+        st.text(format_table(matches, include_cli=args.include_cli, group_by_vendor=args.group_by_vendor))
     else:
-        st.text(format_table(matches_list, include_cli=args.include_cli, group_by_vendor=args.group_by_vendor))
+        # Columnar frame of just this page: most fields come straight from the catalog columns.
+        frame = {name: [read(row) for row in rows] for name, read in _page_readers(catalog)}
+        st.dataframe(frame, hide_index=True, use_container_width=True)
+
+
+def _page_readers(catalog: SwitchCatalog) -> List[Tuple[str, Callable[[int], object]]]:
+    return [(name, catalog.field_reader(name)) for name in PAGE_COLUMNS]
 
 
 def main() -> None:
@@ -83,36 +258,53 @@ def main() -> None:
     st.title("Switch Catalog")
     st.write("Search, filter, and explore common switch models with optional CLI snippets.")
 
-    uploaded_file = st.file_uploader("Upload a catalog JSON file (optional)", type=["json"])
+    uploaded_file = st.file_uploader(
+        "Upload a catalog JSON or JSON Lines file (optional)", type=["json", "jsonl", "ndjson"]
+    )
     catalog, upload_error = _load_uploaded_catalog(uploaded_file)
     if upload_error:
         st.error(upload_error)
+    index = _catalog_index(catalog.version, catalog)
 
-    vendors = sorted({sw.vendor for sw in catalog})
-    vendor_choice = st.selectbox("Vendor", options=["Any"] + vendors)
+    counts = _option_counts(catalog, _spec_from_state())
+    vendor_choice = st.selectbox(
+        "Vendor", options=["Any"] + index.vendors, key="filter_vendor", format_func=counts["vendor"]
+    )
     vendor = None if vendor_choice == "Any" else vendor_choice
 
     col1, col2, col3 = st.columns(3)
     with col1:
-        model = st.text_input("Model contains", value="")
-        layer = st.selectbox("Layer", options=["Any", "L2", "L3"])
+        model = st.text_input("Model contains", value="", key="filter_model")
+        layer = st.selectbox("Layer", options=["Any"] + index.layers, key="filter_layer", format_func=counts["layer"])
         layer_value = None if layer == "Any" else layer
-        poe = st.selectbox("PoE", options=["Any", "yes", "no"])
+        poe = st.selectbox("PoE", options=["Any", "yes", "no"], key="filter_poe", format_func=counts["poe"])
         poe_value = None if poe == "Any" else poe
+        min_poe_budget = st.number_input(
+            "Minimum PoE budget (W)", min_value=0, step=10, value=0, key="filter_min_poe_budget"
+        )
     with col2:
-        keyword = st.text_input("Keyword", value="")
-        min_ports = st.number_input("Minimum ports", min_value=0, step=1, value=0)
-        max_ports = st.number_input("Maximum ports", min_value=0, step=1, value=0)
-        managed = st.selectbox("Managed", options=["Any", "yes", "no"])
+        keyword = st.text_input("Keyword", value="", key="filter_keyword")
+        min_ports = st.number_input("Minimum ports", min_value=0, step=1, value=0, key="filter_min_ports")
+        max_ports = st.number_input("Maximum ports", min_value=0, step=1, value=0, key="filter_max_ports")
+        managed = st.selectbox(
+            "Managed", options=["Any", "yes", "no"], key="filter_managed", format_func=counts["managed"]
+        )
         managed_value = None if managed == "Any" else managed
+        min_uplinks = st.number_input("Minimum uplinks", min_value=0, step=1, value=0, key="filter_min_uplinks")
     with col3:
-        stackable = st.selectbox("Stackable", options=["Any", "yes", "no"])
+        stackable = st.selectbox(
+            "Stackable", options=["Any", "yes", "no"], key="filter_stackable", format_func=counts["stackable"]
+        )
         stackable_value = None if stackable == "Any" else stackable
         include_cli = st.checkbox("Include CLI snippets", value=False)
         group_by_vendor = st.checkbox("Group by vendor", value=False)
         limit = st.number_input("Result limit (0 for no limit)", min_value=0, step=1, value=0)
 
-    output_format = st.radio("Output format", options=["table", "json"], horizontal=True)
+    output_col, page_size_col = st.columns([3, 1])
+    with output_col:
+        output_format = st.radio("Output format", options=["table", "json"], horizontal=True)
+    with page_size_col:
+        page_size = st.selectbox("Page size", options=PAGE_SIZES, index=1)
 
     args = _build_args(
         vendor=vendor,
@@ -121,6 +313,8 @@ def main() -> None:
         layer=layer_value,
         min_ports=min_ports or None,
         max_ports=max_ports or None,
+        min_poe_budget=min_poe_budget or None,
+        min_uplinks=min_uplinks or None,
         poe=poe_value,
         managed=managed_value,
         stackable=stackable_value,
@@ -131,15 +325,15 @@ def main() -> None:
     )
 
     st.subheader("Results")
-    matches = filter_catalog(catalog, args)
-    _display_results(matches, args)
+    _display_results(catalog, FilterSpec.from_args(args), args, page_size)
 
     st.subheader("Ask a quick question")
     question = st.text_input(
         "Natural-language prompt (e.g., '48-port PoE stackable Cisco with troubleshooting commands')"
     )
+    top = st.number_input("Suggestions to show", min_value=1, max_value=10, step=1, value=3)
     if st.button("Get suggestion"):
-        st.info(answer_question(question, catalog))
+        st.info(answer_question(question, catalog, top=int(top)))
 
 
 if __name__ == "__main__":  # pragma: no cover - Streamlit entrypoint